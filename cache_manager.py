@@ -1,7 +1,7 @@
 import json
 import os
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, MutableMapping
 
 logger = logging.getLogger(__name__)
 
@@ -9,10 +9,15 @@ logger = logging.getLogger(__name__)
 class CacheManager:
     """Manages caching of AI suggestions for transactions."""
     
-    def __init__(self, cache_file_path: str = "ai_cache.json"):
+    def __init__(self, cache_file_path: str = "ai_cache.json", storage: Optional[MutableMapping] = None):
+        """Create a file-backed cache, or an in-memory one when a storage mapping is given."""
         self.cache_file_path = cache_file_path
-        self._cache = {}
-        self._load_cache()
+        self._persistent = storage is None
+        if self._persistent:
+            self._cache = {}
+            self._load_cache()
+        else:
+            self._cache = storage
     
     def _load_cache(self) -> None:
         """Load cache from file if it exists."""
@@ -31,6 +36,9 @@ class CacheManager:
     
     def _save_cache(self) -> None:
         """Save cache to file."""
+        if not self._persistent:
+            return
+        
         try:
             # Create directory if it doesn't exist
             cache_dir = os.path.dirname(self.cache_file_path)
@@ -76,7 +84,7 @@ class CacheManager:
     
     def clear_cache(self) -> None:
         """Clear all cached suggestions."""
-        self._cache = {}
+        self._cache.clear()
         self._save_cache()
         logger.info("Cleared all cached suggestions")
     
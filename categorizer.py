@@ -4,6 +4,7 @@ import warnings
 import logging
 import sys
 import argparse
+import subprocess
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 
@@ -187,12 +188,13 @@ class TransactionCategorizer:
             return []
     
     def _process_transactions(self, transactions: List[Dict]):
+        accounts = self.money_client.get_accounts()
         for i, transaction in enumerate(transactions, 1):
             print(f"\n{'═'*70}")
             print(f"🔢 Transaction {i}/{len(transactions)}")
             print('═'*70)
             
-            print(self.money_client.format_transaction(transaction))
+            print(self.money_client.format_transaction(transaction, accounts))
             
             self.stats['processed'] += 1
             
@@ -353,12 +355,13 @@ class TransactionCategorizer:
             input("Press Enter to start interactive confirmation...")
         
         # Now run interactive confirmation using cached suggestions
+        accounts = self.money_client.get_accounts()
         for i, transaction in enumerate(transactions, 1):
             print(f"\n{'═'*70}")
             print(f"🔢 Transaction {i}/{len(transactions)}")
             print('═'*70)
             
-            print(self.money_client.format_transaction(transaction))
+            print(self.money_client.format_transaction(transaction, accounts))
             
             self.stats['processed'] += 1
             
@@ -442,12 +445,13 @@ class TransactionCategorizer:
         if not self.test_mode:
             input("Press Enter to start interactive confirmation...")
         
+        accounts = self.money_client.get_accounts()
         for i, transaction in enumerate(cached_transactions, 1):
             print(f"\n{'═'*70}")
             print(f"🔢 Transaction {i}/{len(cached_transactions)}")
             print('═'*70)
             
-            print(self.money_client.format_transaction(transaction))
+            print(self.money_client.format_transaction(transaction, accounts))
             
             self.stats['processed'] += 1
             
@@ -548,10 +552,9 @@ class TransactionCategorizer:
     def _copy_to_clipboard(self, text: str) -> bool:
         """Copy text to clipboard using pbcopy."""
         try:
-            import subprocess
             process = subprocess.run(
                 ['pbcopy'],
-                input=text.encode(),
+                input=text.encode('utf-8'),
                 check=True
             )
             return process.returncode == 0
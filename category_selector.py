@@ -4,31 +4,98 @@ import tty
 import termios
 import subprocess
 import shutil
-from typing import List, Dict, Optional
-from fuzzywuzzy import fuzz
+import functools
+import contextlib
+import heapq
+from typing import List, Dict, Optional, Tuple
+from rapidfuzz import fuzz
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+
+@contextlib.contextmanager
+def _raw_mode(fd: int):
+    """Read keys unbuffered for the duration of the block, restoring the terminal on exit."""
+    old_settings = termios.tcgetattr(fd)
+    try:
+        tty.setraw(fd)
+        # Keep output processing so menus printed inside the block still render line by line
+        mode = termios.tcgetattr(fd)
+        mode[1] |= termios.OPOST
+        termios.tcsetattr(fd, termios.TCSANOW, mode)
+        yield
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+
+
+@functools.lru_cache(maxsize=1)
+def _fzf_path() -> Optional[str]:
+    """Locate fzf on PATH once per process."""
+    return shutil.which('fzf')
+
+
 class CategorySelector:
     
+    # Longest substring length kept in the search index
+    _INDEX_DEPTH = 3
+    
+    # Single-key commands accepted by get_user_choice; digits select a suggestion
+    _CHOICE_ACTIONS = {
+        'q': lambda self: None,
+        'n': lambda self: {'action': 'skip'},
+        's': lambda self: self._search_categories(),
+    }
+    
     def __init__(self, categories: List[Dict], test_mode: bool = False):
         self.categories = categories
         self.sorted_categories = sorted(categories, key=lambda x: x['full_name'])
+        # Casefolded search keys, computed once instead of on every query
+        self._search_index = [
+            (category, category['full_name'].casefold(), category['name'].casefold())
+            for category in categories
+        ]
+        # Every substring of up to _INDEX_DEPTH characters -> indices of categories containing it
+        self._substring_index = {}
+        for idx, (_, full_name, name) in enumerate(self._search_index):
+            for text in (full_name, name):
+                for start in range(len(text)):
+                    for end in range(start + 1, min(start + self._INDEX_DEPTH, len(text)) + 1):
+                        self._substring_index.setdefault(text[start:end], set()).add(idx)
+        # Ranked matches per casefolded query and limit; retyped searches skip the scan and fuzzy scoring
+        self._ranked_matches = functools.lru_cache(maxsize=256)(self._rank_matches)
+        # fzf input and reverse lookup of its selection; the first category wins on duplicate names
+        # Encoded once so each search hands fzf ready-made bytes instead of re-encoding the list
+        self._fzf_input = '\n'.join(category['full_name'] for category in self.sorted_categories).encode('utf-8')
+        self._by_full_name = {category['full_name']: category for category in reversed(categories)}
+        self._category_tree = None
+        self._tree_rows = None
         self.test_mode = test_mode
-        self.fzf_available = shutil.which('fzf') is not None
+        self.fzf_available = _fzf_path() is not None
+        self._in_raw_mode = False
+        # AppKit module once imported, False when pyobjc is missing, None before the first copy
+        self._appkit = None
+    
+    @contextlib.contextmanager
+    def _keypress_mode(self):
+        """Keep the terminal raw across a whole prompt loop instead of toggling it per key."""
+        if self._in_raw_mode or not sys.stdin.isatty():
+            yield
+            return
+        with _raw_mode(sys.stdin.fileno()):
+            self._in_raw_mode = True
+            try:
+                yield
+            finally:
+                self._in_raw_mode = False
     
     def _getch(self) -> str:
         """Get a single character from stdin without requiring Enter."""
+        if self._in_raw_mode:
+            return sys.stdin.read(1)
         if sys.stdin.isatty():
-            fd = sys.stdin.fileno()
-            old_settings = termios.tcgetattr(fd)
-            try:
-                tty.setraw(sys.stdin.fileno())
-                ch = sys.stdin.read(1)
-            finally:
-                termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-            return ch
+            with _raw_mode(sys.stdin.fileno()):
+                return sys.stdin.read(1)
         else:
             # Fallback for non-tty environments
             return input().strip().lower()[:1]
@@ -47,8 +114,8 @@ class CategorySelector:
             print(f"\n🤖 {YELLOW}No LLM suggestions available.{RESET}")
             return
         
-        print(f"\n🤖 {CYAN}{BOLD}AI Category Suggestions:{RESET}")
-        print("─" * 60)
+        # Assemble the whole listing and write it at once
+        lines = [f"\n🤖 {CYAN}{BOLD}AI Category Suggestions:{RESET}", "─" * 60]
         
         for i, suggestion in enumerate(suggestions, 1):
             category = suggestion['category']
@@ -66,11 +133,13 @@ class CategorySelector:
                 conf_color = '\033[91m'  # Red
                 conf_icon = "🔴"
             
-            print(f"{BOLD}{i}.{RESET} 📂 {BLUE}{category['full_name']}{RESET}")
-            print(f"   {conf_icon} {BOLD}Confidence:{RESET} {conf_color}{confidence:.0%}{RESET}")
+            lines.append(f"{BOLD}{i}.{RESET} 📂 {BLUE}{category['full_name']}{RESET}")
+            lines.append(f"   {conf_icon} {BOLD}Confidence:{RESET} {conf_color}{int(confidence * 100 + 0.5)}%{RESET}")
             if reasoning:
-                print(f"   💭 {BOLD}Reasoning:{RESET} {reasoning}")
-            print()
+                lines.append(f"   💭 {BOLD}Reasoning:{RESET} {reasoning}")
+            lines.append("")
+        
+        sys.stdout.write('\n'.join(lines) + '\n')
     
     def get_user_choice(self, suggestions: List[Dict]) -> Optional[Dict]:
         # Color codes
@@ -101,12 +170,9 @@ class CategorySelector:
                 choice = self._getch().lower()
                 print(f"{BOLD}{choice}{RESET}")  # Echo the choice with formatting
                 
-                if choice == 'q':
-                    return None
-                elif choice == 'n':
-                    return {'action': 'skip'}
-                elif choice == 's':
-                    return self._search_categories()
+                handler = self._CHOICE_ACTIONS.get(choice)
+                if handler is not None:
+                    return handler(self)
                 elif choice.isdigit():
                     idx = int(choice) - 1
                     if 0 <= idx < len(suggestions):
@@ -134,38 +200,31 @@ class CategorySelector:
     
     def _fzf_search_categories(self) -> Optional[Dict]:
         try:
-            # Prepare category list for FZF
-            category_lines = []
-            for category in self.sorted_categories:
-                category_lines.append(category['full_name'])
-            
             # Create FZF process
             fzf_process = subprocess.Popen(
                 ['fzf', '--height=50%', '--reverse', '--prompt=Category: ', '--header=Select a category (ESC to cancel)'],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
+                stderr=subprocess.PIPE
             )
             
             # Send category list to FZF
-            stdout, stderr = fzf_process.communicate('\n'.join(category_lines))
+            stdout, stderr = fzf_process.communicate(self._fzf_input)
             
             if fzf_process.returncode == 0:  # User made a selection
-                selected_name = stdout.strip()
-                for category in self.categories:
-                    if category['full_name'] == selected_name:
-                        return {
-                            'action': 'categorize',
-                            'category': category
-                        }
+                category = self._by_full_name.get(stdout.decode('utf-8').strip())
+                if category is not None:
+                    return {
+                        'action': 'categorize',
+                        'category': category
+                    }
             elif fzf_process.returncode == 1:  # No match found
                 print("No category selected.")
                 return {'action': 'back'}
             elif fzf_process.returncode == 130:  # User cancelled (Ctrl+C or ESC)
                 return {'action': 'back'}
             else:
-                logger.warning(f"FZF exited with code {fzf_process.returncode}: {stderr}")
+                logger.warning(f"FZF exited with code {fzf_process.returncode}: {stderr.decode('utf-8', 'replace')}")
                 return {'action': 'back'}
                 
         except Exception as e:
@@ -205,86 +264,101 @@ class CategorySelector:
                 return {'action': 'back'}
     
     def _find_matching_categories(self, query: str) -> List[Dict]:
+        ranked = self._ranked_matches(query.casefold(), Config.MAX_SEARCH_RESULTS)
+        return [self._search_index[idx][0] for idx in ranked]
+    
+    def _rank_matches(self, query_folded: str, limit: int) -> Tuple[int, ...]:
+        """Return indices of the top `limit` categories containing the query, best fuzzy score first."""
         matches = []
-        query_lower = query.lower()
         
-        for category in self.categories:
-            full_name = category['full_name'].lower()
-            name = category['name'].lower()
-            
-            if query_lower in full_name or query_lower in name:
-                score = max(
-                    fuzz.partial_ratio(query_lower, full_name),
-                    fuzz.partial_ratio(query_lower, name)
-                )
-                matches.append((category, score))
+        # A category can only contain the query if it contains the query's first characters
+        if query_folded:
+            candidates = sorted(self._substring_index.get(query_folded[:self._INDEX_DEPTH], ()))
+        else:
+            candidates = range(len(self._search_index))
         
-        matches.sort(key=lambda x: x[1], reverse=True)
+        for idx in candidates:
+            _, full_name, name = self._search_index[idx]
+            if query_folded in full_name:
+                # An exact substring is already a perfect partial match; skip fuzzy scoring
+                matches.append((idx, 100))
+            elif query_folded in name:
+                score = max(fuzz.partial_ratio(query_folded, full_name), fuzz.partial_ratio(query_folded, name))
+                matches.append((idx, score))
         
-        return [match[0] for match in matches[:Config.MAX_SEARCH_RESULTS]]
+        # Same order as a stable descending sort, without sorting the whole match list
+        top = heapq.nlargest(limit, matches, key=lambda x: x[1])
+        
+        return tuple(match[0] for match in top)
     
     def _display_search_results(self, matches: List[Dict]) -> Optional[Dict]:
-        print(f"\nFound {len(matches)} matching categories:")
-        print("-" * 40)
-        
-        for i, category in enumerate(matches, 1):
-            print(f"{i:2d}. {category['full_name']}")
+        lines = [f"\nFound {len(matches)} matching categories:", "-" * 40]
+        lines.extend(f"{i:2d}. {category['full_name']}" for i, category in enumerate(matches, 1))
+        lines.append(f"\n[1-{len(matches)}] Select category")
+        lines.append("[b] Back to search")
+        lines.append("[r] Return to suggestions")
+        sys.stdout.write('\n'.join(lines) + '\n')
         
-        print(f"\n[1-{len(matches)}] Select category")
-        print("[b] Back to search")
-        print("[r] Return to suggestions")
-        
-        while True:
-            try:
-                print("Choice (no Enter needed): ", end='', flush=True)
-                choice = self._getch().lower()
-                print(choice)  # Echo the choice
-                
-                if choice == 'b':
-                    return None
-                elif choice == 'r':
-                    return {'action': 'back'}
-                elif choice.isdigit():
-                    idx = int(choice) - 1
-                    if 0 <= idx < len(matches):
-                        return {
-                            'action': 'categorize',
-                            'category': matches[idx]
-                        }
+        with self._keypress_mode():
+            while True:
+                try:
+                    print("Choice (no Enter needed): ", end='', flush=True)
+                    choice = self._getch().lower()
+                    print(choice)  # Echo the choice
+                    
+                    if choice == 'b':
+                        return None
+                    elif choice == 'r':
+                        return {'action': 'back'}
+                    elif choice.isdigit():
+                        idx = int(choice) - 1
+                        if 0 <= idx < len(matches):
+                            return {
+                                'action': 'categorize',
+                                'category': matches[idx]
+                            }
+                        else:
+                            print(f"Invalid selection. Please choose 1-{len(matches)}")
                     else:
-                        print(f"Invalid selection. Please choose 1-{len(matches)}")
-                else:
-                    print("Invalid input. Please try again.")
+                        print("Invalid input. Please try again.")
                     
-            except ValueError:
-                print("Invalid input. Please enter a number or command.")
+                except ValueError:
+                    print("Invalid input. Please enter a number or command.")
     
     def display_category_tree(self, max_depth: int = 2) -> None:
-        tree = self._build_category_tree()
-        self._print_tree(tree, max_depth=max_depth)
+        if self._tree_rows is None:
+            self._tree_rows = self._flatten_tree(self._build_category_tree())
+        lines = [line for depth, line in self._tree_rows if depth < max_depth]
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
     
     def _build_category_tree(self) -> Dict:
+        # The category list is fixed for the selector's lifetime, so build the tree only once
+        if self._category_tree is not None:
+            return self._category_tree
+        
         tree = {}
         
         for category in self.categories:
-            parts = category['full_name'].split(' > ')
             current = tree
+            rest = category['full_name']
             
-            for part in parts:
-                if part not in current:
-                    current[part] = {}
-                current = current[part]
+            # Walk the path one level at a time without building a parts list
+            while rest:
+                part, _, rest = rest.partition(' > ')
+                current = current.setdefault(part, {})
         
+        self._category_tree = tree
         return tree
     
-    def _print_tree(self, tree: Dict, indent: str = "", max_depth: int = 2, current_depth: int = 0) -> None:
-        if current_depth >= max_depth:
-            return
-            
+    def _flatten_tree(self, tree: Dict, depth: int = 0) -> List[Tuple[int, str]]:
+        """Return (depth, display line) rows for the whole tree in display order."""
+        rows = []
+        indent = "  " * depth
         for name, subtree in sorted(tree.items()):
-            print(f"{indent}- {name}")
-            if subtree and current_depth < max_depth - 1:
-                self._print_tree(subtree, indent + "  ", max_depth, current_depth + 1)
+            rows.append((depth, f"{indent}- {name}"))
+            rows.extend(self._flatten_tree(subtree, depth + 1))
+        return rows
     
     def offer_rule_generation(self) -> bool:
         """Ask user if they want to generate a categorization rule."""
@@ -337,36 +411,52 @@ class CategorySelector:
         print("─" * 60)
         print(f"📋 {BOLD}Rule:{RESET} {BLUE}{rule_text}{RESET}")
         print(f"💭 {BOLD}Explanation:{RESET} {explanation}")
-        print(f"{conf_icon} {BOLD}Confidence:{RESET} {conf_color}{confidence:.0%}{RESET}")
+        print(f"{conf_icon} {BOLD}Confidence:{RESET} {conf_color}{int(confidence * 100 + 0.5)}%{RESET}")
         
-        while True:
-            print(f"\n⚡ {BOLD}Options:{RESET}")
-            print(f"   {GREEN}[c]{RESET} 📋 Copy to clipboard")
-            print(f"   {YELLOW}[d]{RESET} ⏭️  Decline rule")
-            
-            print(f"\n👉 {BOLD}Your choice (no Enter needed):{RESET} ", end='', flush=True)
-            choice = self._getch().lower()
-            print(f"{BOLD}{choice}{RESET}")  # Echo the choice with formatting
-            
-            if choice == 'c':
-                success = self._copy_rule_to_clipboard(rule_text)
-                if success:
-                    print(f"✅ Rule copied to clipboard! Paste it into MoneyMoney rules.")
+        with self._keypress_mode():
+            while True:
+                print(f"\n⚡ {BOLD}Options:{RESET}")
+                print(f"   {GREEN}[c]{RESET} 📋 Copy to clipboard")
+                print(f"   {YELLOW}[d]{RESET} ⏭️  Decline rule")
+                
+                print(f"\n👉 {BOLD}Your choice (no Enter needed):{RESET} ", end='', flush=True)
+                choice = self._getch().lower()
+                print(f"{BOLD}{choice}{RESET}")  # Echo the choice with formatting
+                
+                if choice == 'c':
+                    success = self._copy_rule_to_clipboard(rule_text)
+                    if success:
+                        print(f"✅ Rule copied to clipboard! Paste it into MoneyMoney rules.")
+                    else:
+                        print(f"❌ Failed to copy rule to clipboard.")
+                    return 'copy'
+                elif choice == 'd':
+                    print("Rule proposal declined.")
+                    return 'declined'
                 else:
-                    print(f"❌ Failed to copy rule to clipboard.")
-                return 'copy'
-            elif choice == 'd':
-                print("Rule proposal declined.")
-                return 'declined'
-            else:
-                print("Invalid input. Please try again.")
+                    print("Invalid input. Please try again.")
+    
+    def _get_appkit(self):
+        """Import AppKit on first use so startup does not pay for pyobjc; None if unavailable."""
+        if self._appkit is None:
+            try:
+                import AppKit
+                self._appkit = AppKit
+            except ImportError:
+                self._appkit = False
+        return self._appkit or None
     
     def _copy_rule_to_clipboard(self, rule_text: str) -> bool:
-        """Copy rule text to clipboard using pbcopy."""
+        """Copy rule text to clipboard via AppKit, falling back to pbcopy."""
         try:
+            appkit = self._get_appkit()
+            if appkit is not None:
+                pasteboard = appkit.NSPasteboard.generalPasteboard()
+                pasteboard.clearContents()
+                return bool(pasteboard.setString_forType_(rule_text, appkit.NSPasteboardTypeString))
             process = subprocess.run(
                 ['pbcopy'],
-                input=rule_text.encode(),
+                input=rule_text.encode('utf-8'),
                 check=True
             )
             return process.returncode == 0
@@ -10,6 +10,12 @@ class Config:
     
     NUM_SUGGESTIONS = int(os.getenv('NUM_SUGGESTIONS', '5'))
     
+    # Transactions sent to the LLM per request by categorize_transactions_batch and generate_categorization_rules_batch
+    LLM_BATCH_SIZE = int(os.getenv('LLM_BATCH_SIZE', '8'))
+    
+    # Concurrent LLM requests issued by categorize_transactions_parallel
+    LLM_MAX_PARALLEL = int(os.getenv('LLM_MAX_PARALLEL', '4'))
+    
     DEFAULT_FROM_DATE = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
     
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -1,40 +1,132 @@
 import requests
 import json
 import logging
-from typing import List, Dict, Optional
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Saveback/cashback amounts in a purpose text; they don't indicate the transaction category
+_SAVEBACK_RE = re.compile(r'saveback:?\s*[\d,.\s€$]+', re.IGNORECASE)
+_CASHBACK_RE = re.compile(r'cashback:?\s*[\d,.\s€$]+', re.IGNORECASE)
+
+# Reasoning blocks some models (e.g. DeepSeek) emit before the JSON answer
+_THINK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+_THINKING_RE = re.compile(r'<thinking>.*?</thinking>', re.DOTALL)
+
+# Rule syntax and quality criteria shared by the single and batch rule generation prompts
+_RULE_SYNTAX = """MoneyMoney Rule Syntax:
+- Search for words using text in quotes: "STARBUCKS"
+- Use field prefixes: name:"text", purpose:"text", amount>value, amount<value
+- Combine conditions: AND, OR, NOT
+- Use parentheses for grouping: (condition1 OR condition2) AND condition3
+- Available fields: name, purpose, local_account, remote_account, currency, reference, mandate, creditor_id, comment, booking_text
+
+Each rule should:
+1. Be specific enough to avoid false positives
+2. Be general enough to catch similar transactions
+3. Use the most reliable transaction fields (name is usually most reliable)
+4. Consider amount ranges if relevant for this type of transaction"""
+
+_RULE_EXAMPLES = """Examples of good rules:
+- name:"STARBUCKS" (matches all Starbucks transactions)
+- name:"SHELL" AND purpose:"FUEL" (gas station fuel purchases)
+- name:"AMAZON" AND amount<50.00 (small Amazon purchases)
+- purpose:"SALARY" OR purpose:"WAGE" (salary payments)"""
+
 class LMStudioClient:
     
-    def __init__(self):
+    # Seconds an auto-detected model is reused before /models is queried again
+    _MODEL_CACHE_TTL = 60.0
+    
+    def __init__(self, session: Optional[requests.Session] = None):
+        """Create a client on a new HTTP session, or on the given one."""
         self.base_url = Config.LM_STUDIO_BASE_URL
         self.model = Config.LM_STUDIO_MODEL
-        self.session = requests.Session()
+        if session is None:
+            session = requests.Session()
+            # Keep enough pooled keep-alive connections for parallel categorization
+            pool_size = max(Config.LLM_MAX_PARALLEL, requests.adapters.DEFAULT_POOLSIZE)
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
         self.session.headers.update({
             'Content-Type': 'application/json'
         })
+        # Last category list formatted for prompts and its text; the list is kept so its id can't be reused
+        self._formatted_categories = (None, '')
+        # Lookup tables for the last category list suggestions were matched against
+        self._category_index = (None, None)
+        # Last category list text and the system prompt built around it
+        self._system_prompt = (None, '')
+        # Auto-detected model and the time.monotonic() it was resolved at
+        self._model_cache = (None, 0.0)
+        # Category list the cached suggestions were made against, and suggestions by similar-transaction key
+        self._suggestion_cache = (None, {})
     
     def categorize_transaction(self, transaction: Dict, categories: List[Dict]) -> List[Dict]:
+        cached_categories, cached_suggestions = self._suggestion_cache
+        if cached_categories is not categories:
+            cached_suggestions = {}
+            self._suggestion_cache = (categories, cached_suggestions)
+        
+        # Repeated merchants (the bulk of a bank statement) reuse the first answer instead of asking again
+        cache_key = self._suggestion_cache_key(transaction)
+        if cache_key in cached_suggestions:
+            logger.debug(f"Reusing suggestions for similar transaction: {transaction.get('name', 'Unknown')}")
+            return list(cached_suggestions[cache_key])
+        
         category_list = self._format_categories_for_prompt(categories)
         
-        prompt = self._build_categorization_prompt(transaction, category_list)
+        # Instructions and categories go in the system message, which is identical for every
+        # transaction in a run, so the server can reuse its prefill and only process the transaction
+        system_prompt = self._build_categorization_system_prompt(category_list)
+        prompt = self._build_categorization_prompt(transaction)
         
         try:
-            response = self._call_llm(prompt)
-            suggestions = self._parse_suggestions(response, categories)
-            return suggestions[:Config.NUM_SUGGESTIONS]
+            response = self._call_llm(prompt, system_prompt=system_prompt)
+            suggestions = self._parse_suggestions(response, categories)[:Config.NUM_SUGGESTIONS]
         except Exception as e:
             logger.error(f"LLM categorization failed: {e}")
             return []
+        
+        if suggestions:
+            cached_suggestions[cache_key] = suggestions
+        return list(suggestions)
+    
+    def _suggestion_cache_key(self, transaction: Dict) -> tuple:
+        """Key under which transactions are similar enough to share suggestions."""
+        amount = transaction.get('amount', 0) or 0
+        return (
+            transaction.get('name', '').strip().casefold(),
+            amount < 0,
+            round(abs(amount), -1),
+            (transaction.get('purpose', '') or '')[:64],
+            transaction.get('comment', ''),
+            transaction.get('bookingText', ''),
+        )
     
-    def _format_categories_for_prompt(self, categories: List[Dict]) -> str:       
+    def _format_categories_for_prompt(self, categories: List[Dict]) -> str:
+        # A run passes the same category list for every transaction, so format it only once
+        cached_categories, cached_text = self._formatted_categories
+        if cached_categories is categories:
+            return cached_text
+        
+        text = self._render_categories(categories)
+        self._formatted_categories = (categories, text)
+        return text
+    
+    def _render_categories(self, categories: List[Dict]) -> str:
         formatted = []
-        for cat in categories:
+        # Categories are numbered from 1; a short ID costs far fewer prompt tokens than a UUID
+        for category_id, cat in enumerate(categories, 1):
             # Use MoneyMoney path format for consistency with existing training data
             path_for_llm = cat.get('moneymoney_path', cat['full_name'])
-            category_line = f"- {path_for_llm} (UUID: {cat['uuid']})"
+            category_line = f"- [{category_id}] {path_for_llm}"
             
             # Add hierarchy context if available
             if 'parent_path' in cat and cat['parent_path']:
@@ -45,7 +137,41 @@ class LMStudioClient:
             formatted.append(category_line)
         return '\n'.join(formatted)
     
-    def _build_categorization_prompt(self, transaction: Dict, category_list: str) -> str:
+    def categorize_transactions_batch(self, transactions: List[Dict], categories: List[Dict],
+                                      batch_size: Optional[int] = None) -> List[List[Dict]]:
+        """Categorize several transactions per LLM call; returns one suggestion list per transaction, in order."""
+        batch_size = batch_size or Config.LLM_BATCH_SIZE
+        category_list = self._format_categories_for_prompt(categories)
+        # Same system message as single-transaction calls, so the server can reuse its prefill
+        system_prompt = self._build_categorization_system_prompt(category_list)
+        
+        results = []
+        for start in range(0, len(transactions), batch_size):
+            batch = transactions[start:start + batch_size]
+            prompt = self._build_batch_categorization_prompt(batch)
+            
+            try:
+                response = self._call_llm(prompt, system_prompt=system_prompt)
+                results.extend(self._parse_batch_suggestions(response, categories, len(batch)))
+            except Exception as e:
+                logger.error(f"LLM batch categorization failed: {e}")
+                results.extend([] for _ in batch)
+        
+        return results
+    
+    def categorize_transactions_parallel(self, transactions: List[Dict], categories: List[Dict],
+                                         max_workers: Optional[int] = None) -> List[List[Dict]]:
+        """Categorize transactions with concurrent LLM requests; returns one suggestion list per transaction, in order."""
+        max_workers = max_workers or Config.LLM_MAX_PARALLEL
+        if not transactions:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(transactions))) as executor:
+            return list(executor.map(lambda transaction: self.categorize_transaction(transaction, categories),
+                                     transactions))
+    
+    def _describe_transaction(self, transaction: Dict) -> str:
+        """Render the transaction fields the LLM categorizes on."""
         name = transaction.get('name', 'Unknown')
         amount = transaction.get('amount', 0)
         purpose = transaction.get('purpose', '')
@@ -56,12 +182,10 @@ class LMStudioClient:
         cleaned_purpose = purpose
         if purpose:
             # Remove saveback/cashback mentions as they don't indicate the transaction category
-            import re
-            cleaned_purpose = re.sub(r'saveback:?\s*[\d,.\s€$]+', '', purpose, flags=re.IGNORECASE)
-            cleaned_purpose = re.sub(r'cashback:?\s*[\d,.\s€$]+', '', cleaned_purpose, flags=re.IGNORECASE)
+            cleaned_purpose = _SAVEBACK_RE.sub('', purpose)
+            cleaned_purpose = _CASHBACK_RE.sub('', cleaned_purpose)
             cleaned_purpose = cleaned_purpose.strip()
         
-        # Build transaction description with all available information
         transaction_desc = f"Merchant/Name: {name}\nAmount: {amount}"
         
         if cleaned_purpose:
@@ -73,18 +197,23 @@ class LMStudioClient:
         if booking_text:
             transaction_desc += f"\nBank Booking Text: {booking_text}"
         
-        prompt = f"""You are a financial transaction categorization assistant. Analyze the following transaction and suggest the most appropriate categories from the provided list.
+        return transaction_desc
+    
+    def _build_categorization_system_prompt(self, category_list: str) -> str:
+        # The formatted category list is cached per run, so the same text object comes back each time
+        cached_list, cached_prompt = self._system_prompt
+        if cached_list is category_list:
+            return cached_prompt
+        
+        prompt = f"""You are a financial transaction categorization assistant. Analyze the transaction given by the user and suggest the most appropriate categories from the provided list.
 
-IMPORTANT: Only suggest categories that are in the provided list. Each suggestion must include the exact category path and UUID from the list.
+IMPORTANT: Only suggest categories that are in the provided list. Each suggestion must include the exact category ID and path from the list.
 
 The categories are organized hierarchically - use this context to make better suggestions:
 - Higher hierarchy levels (like Level 3) are more specific than lower levels (Level 1)
 - Parent categories provide context for understanding the category's purpose
 - Choose the most specific category that matches the transaction when possible
 
-Transaction Details:
-{transaction_desc}
-
 Available Categories (with hierarchy context):
 {category_list}
 
@@ -93,7 +222,7 @@ Please provide your top {Config.NUM_SUGGESTIONS} category suggestions in the fol
     "suggestions": [
         {{
             "category_path": "Exact category name from list",
-            "uuid": "exact-uuid-from-list",
+            "category_id": 12,
             "confidence": 0.85,
             "reasoning": "Brief explanation for this categorization"
         }}
@@ -107,24 +236,57 @@ Categorization Guidelines:
 4. Consider bank booking text for transaction type information
 5. Match to logical expense categories
 6. Ignore saveback/cashback information - categorize based on the actual purchase
-7. Only use categories from the provided list with exact names and UUIDs
-8. IMPORTANT: Each category UUID must appear only once in your suggestions - do not duplicate categories
+7. Only use categories from the provided list with exact IDs and names
+8. IMPORTANT: Each category ID must appear only once in your suggestions - do not duplicate categories
 9. Negative amounts are expenses, positive amounts are income - categorize accordingly
 
+Respond only with valid JSON."""
+        
+        self._system_prompt = (category_list, prompt)
+        return prompt
+    
+    def _build_categorization_prompt(self, transaction: Dict) -> str:
+        return f"Transaction Details:\n{self._describe_transaction(transaction)}"
+    
+    def _build_batch_categorization_prompt(self, transactions: List[Dict]) -> str:
+        """User message for a batch; instructions and categories come from the shared system prompt."""
+        transaction_blocks = '\n\n'.join(
+            f"Transaction {i}:\n{self._describe_transaction(transaction)}"
+            for i, transaction in enumerate(transactions, 1)
+        )
+        
+        prompt = f"""Categorize each of the following {len(transactions)} transactions independently.
+
+{transaction_blocks}
+
+Instead of a single "suggestions" object, return exactly one result per transaction in the following JSON format, using the transaction number as query_id and the suggestion format described above:
+{{
+    "results": [
+        {{
+            "query_id": 1,
+            "suggestions": [...]
+        }}
+    ]
+}}
+
 Respond only with valid JSON."""
         
         return prompt
     
-    def _call_llm(self, prompt: str) -> str:
+    def _call_llm(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         url = f"{self.base_url}/chat/completions"
         
+        messages = [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        
         payload = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            "messages": messages,
             "temperature": 0.3,
             "max_tokens": 8000,
             "stream": False
@@ -143,91 +305,169 @@ Respond only with valid JSON."""
             return result['choices'][0]['message']['content']
         except requests.exceptions.HTTPError as e:
             logger.error(f"HTTP error {e.response.status_code}: {e.response.text}")
+            # The auto-detected model may have been unloaded; detect again on the next call
+            self._model_cache = (None, 0.0)
             raise
         except Exception as e:
             logger.error(f"LLM API call failed: {e}")
             raise
     
+    def _clean_llm_response(self, llm_response: str) -> str:
+        """Strip thinking tags and markdown fences around the JSON in an LLM reply."""
+        # Clean the response - remove thinking tags first (DeepSeek model outputs these)
+        cleaned_response = llm_response.strip()
+        
+        # Remove thinking tags that DeepSeek models output
+        cleaned_response = _THINK_RE.sub('', cleaned_response)
+        cleaned_response = _THINKING_RE.sub('', cleaned_response)
+        cleaned_response = cleaned_response.strip()
+        
+        # Handle markdown-wrapped JSON
+        if '```json' in cleaned_response:
+            # Extract JSON from markdown code blocks
+            start = cleaned_response.find('```json') + 7
+            end = cleaned_response.find('```', start)
+            if end != -1:
+                cleaned_response = cleaned_response[start:end].strip()
+        elif '```' in cleaned_response:
+            # Handle generic code blocks
+            start = cleaned_response.find('```') + 3
+            end = cleaned_response.find('```', start)
+            if end != -1:
+                cleaned_response = cleaned_response[start:end].strip()
+        
+        return cleaned_response
+    
     def _parse_suggestions(self, llm_response: str, categories: List[Dict]) -> List[Dict]:
         try:
-            # Clean the response - remove thinking tags first (DeepSeek model outputs these)
-            cleaned_response = llm_response.strip()
-            
-            # Remove thinking tags that DeepSeek models output
-            import re
-            cleaned_response = re.sub(r'<think>.*?</think>', '', cleaned_response, flags=re.DOTALL)
-            cleaned_response = re.sub(r'<thinking>.*?</thinking>', '', cleaned_response, flags=re.DOTALL)
-            cleaned_response = cleaned_response.strip()
-            
-            # Handle markdown-wrapped JSON
-            if '```json' in cleaned_response:
-                # Extract JSON from markdown code blocks
-                start = cleaned_response.find('```json') + 7
-                end = cleaned_response.find('```', start)
-                if end != -1:
-                    cleaned_response = cleaned_response[start:end].strip()
-            elif '```' in cleaned_response:
-                # Handle generic code blocks
-                start = cleaned_response.find('```') + 3
-                end = cleaned_response.find('```', start)
-                if end != -1:
-                    cleaned_response = cleaned_response[start:end].strip()
-            
+            cleaned_response = self._clean_llm_response(llm_response)
             logger.debug(f"Cleaned LLM response: {cleaned_response}")
             data = json.loads(cleaned_response)
-            suggestions = data.get('suggestions', [])
+            return self._validate_suggestions(data.get('suggestions', []), categories)
             
-            validated_suggestions = []
-            seen_uuids = set()
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse LLM response as JSON: {e}")
+            logger.error(f"Raw LLM response: {repr(llm_response)}")
+            return []
+    
+    def _parse_batch_suggestions(self, llm_response: str, categories: List[Dict], count: int) -> List[List[Dict]]:
+        """Split a batch reply into one validated suggestion list per transaction, by query_id."""
+        try:
+            cleaned_response = self._clean_llm_response(llm_response)
+            logger.debug(f"Cleaned LLM batch response: {cleaned_response}")
+            data = json.loads(cleaned_response)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse LLM batch response as JSON: {e}")
+            logger.error(f"Raw LLM response: {repr(llm_response)}")
+            return [[] for _ in range(count)]
+        
+        suggestions_by_query = {}
+        for result in data.get('results', []):
+            try:
+                query_id = int(result.get('query_id'))
+            except (TypeError, ValueError):
+                continue
+            suggestions_by_query.setdefault(query_id, result.get('suggestions', []))
+        
+        return [
+            self._validate_suggestions(suggestions_by_query.get(query_id, []), categories)[:Config.NUM_SUGGESTIONS]
+            for query_id in range(1, count + 1)
+        ]
+    
+    def _validate_suggestions(self, suggestions: List[Dict], categories: List[Dict]) -> List[Dict]:
+        """Keep suggestions that name a known category, once per category UUID."""
+        validated_suggestions = []
+        seen_uuids = set()
+        
+        for suggestion in suggestions:
+            category_path = suggestion.get('category_path', '')
+            uuid = suggestion.get('uuid', '')
+            confidence = suggestion.get('confidence', 0.0)
+            reasoning = suggestion.get('reasoning', '')
             
-            for suggestion in suggestions:
-                category_path = suggestion.get('category_path', '')
-                uuid = suggestion.get('uuid', '')
-                confidence = suggestion.get('confidence', 0.0)
-                reasoning = suggestion.get('reasoning', '')
-                
+            matching_category = self._find_category_by_id(categories, suggestion.get('category_id'), category_path)
+            if matching_category is None:
                 matching_category = self._find_category_by_path_or_uuid(
                     categories, category_path, uuid
                 )
-                
-                if matching_category and matching_category['uuid'] not in seen_uuids:
-                    seen_uuids.add(matching_category['uuid'])
-                    validated_suggestions.append({
-                        'category': matching_category,
-                        'confidence': confidence,
-                        'reasoning': reasoning
-                    })
             
-            return validated_suggestions
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse LLM response as JSON: {e}")
-            logger.error(f"Raw LLM response: {repr(llm_response)}")
-            return []
+            if matching_category and matching_category['uuid'] not in seen_uuids:
+                seen_uuids.add(matching_category['uuid'])
+                validated_suggestions.append({
+                    'category': matching_category,
+                    'confidence': confidence,
+                    'reasoning': reasoning
+                })
+        
+        return validated_suggestions
+    
+    def _find_category_by_id(self, categories: List[Dict], category_id, path: str) -> Optional[Dict]:
+        """Resolve the 1-based prompt ID, unless the path the model gave names a different category."""
+        if isinstance(category_id, str) and category_id.strip().isdigit():
+            category_id = int(category_id)
+        if not isinstance(category_id, int) or isinstance(category_id, bool):
+            return None
+        if not 1 <= category_id <= len(categories):
+            return None
+        
+        category = categories[category_id - 1]
+        if path and path not in (category['full_name'], category.get('moneymoney_path')):
+            return None
+        return category
     
     def _find_category_by_path_or_uuid(self, categories: List[Dict], path: str, uuid: str) -> Optional[Dict]:
-        # First try exact matches
-        for category in categories:
-            if (category['uuid'] == uuid or 
-                category['full_name'] == path or 
-                category.get('moneymoney_path', '') == path):
-                return category
-        
-        # Then try partial matches on both path formats
-        for category in categories:
-            if (path.lower() in category['full_name'].lower() or
-                path.lower() in category.get('moneymoney_path', '').lower()):
-                return category
+        by_uuid, by_full_name, by_moneymoney_path, folded_paths = self._index_categories(categories)
+        
+        # First try exact matches; the earliest category matching any key wins
+        exact = [idx for idx in (by_uuid.get(uuid), by_full_name.get(path), by_moneymoney_path.get(path))
+                 if idx is not None]
+        if exact:
+            return categories[min(exact)]
+        
+        # Then try partial matches on both path formats; casefold also folds e.g. "ß" to "ss"
+        needle = path.casefold()
+        for idx, (full_name_folded, moneymoney_path_folded) in enumerate(folded_paths):
+            if needle in full_name_folded or needle in moneymoney_path_folded:
+                return categories[idx]
         
         return None
     
+    def _index_categories(self, categories: List[Dict]):
+        """Build (or reuse) exact-match dicts and casefolded paths for a category list."""
+        cached_categories, index = self._category_index
+        if cached_categories is categories:
+            return index
+        
+        by_uuid, by_full_name, by_moneymoney_path = {}, {}, {}
+        folded_paths = []
+        for idx, category in enumerate(categories):
+            moneymoney_path = category.get('moneymoney_path', '')
+            by_uuid.setdefault(category['uuid'], idx)
+            by_full_name.setdefault(category['full_name'], idx)
+            by_moneymoney_path.setdefault(moneymoney_path, idx)
+            folded_paths.append((category['full_name'].casefold(), moneymoney_path.casefold()))
+        
+        index = (by_uuid, by_full_name, by_moneymoney_path, folded_paths)
+        self._category_index = (categories, index)
+        return index
+    
     def _get_model_to_use(self) -> Optional[str]:
         """Get the model to use for API calls. Returns configured model or auto-detects."""
         if self.model:
             logger.debug(f"Using configured model: {self.model}")
             return self.model
         
-        # Auto-detect available models
+        cached_model, resolved_at = self._model_cache
+        if cached_model and time.monotonic() - resolved_at < self._MODEL_CACHE_TTL:
+            return cached_model
+        
+        model = self._detect_model()
+        if model:
+            self._model_cache = (model, time.monotonic())
+        return model
+    
+    def _detect_model(self) -> Optional[str]:
+        """Pick a model from the ones LM Studio has loaded, preferring chat models."""
         try:
             available_models = self._get_available_models()
             if not available_models:
@@ -273,24 +513,7 @@ Respond only with valid JSON."""
     
     def generate_categorization_rule(self, transaction: Dict, category: Dict) -> Optional[Dict]:
         """Generate a MoneyMoney categorization rule for the given transaction and category."""
-        name = transaction.get('name', 'Unknown')
-        amount = transaction.get('amount', 0)
-        purpose = transaction.get('purpose', '')
-        comment = transaction.get('comment', '')
-        booking_text = transaction.get('bookingText', '')
-        
-        # Build transaction description for rule generation
-        transaction_desc = f"Merchant/Name: {name}\nAmount: {amount}"
-        
-        if purpose:
-            transaction_desc += f"\nDescription: {purpose}"
-            
-        if comment:
-            transaction_desc += f"\nUser Comment: {comment}"
-            
-        if booking_text:
-            transaction_desc += f"\nBank Booking Text: {booking_text}"
-        
+        transaction_desc = self._describe_rule_transaction(transaction)
         category_path = category.get('full_name', 'Unknown')
         
         prompt = f"""You are an expert at creating MoneyMoney categorization rules. Generate a precise rule that would automatically categorize similar transactions to the category "{category_path}".
@@ -300,18 +523,7 @@ Transaction to analyze:
 
 Target Category: {category_path}
 
-MoneyMoney Rule Syntax:
-- Search for words using text in quotes: "STARBUCKS"
-- Use field prefixes: name:"text", purpose:"text", amount>value, amount<value
-- Combine conditions: AND, OR, NOT
-- Use parentheses for grouping: (condition1 OR condition2) AND condition3
-- Available fields: name, purpose, local_account, remote_account, currency, reference, mandate, creditor_id, comment, booking_text
-
-Create a rule that:
-1. Is specific enough to avoid false positives
-2. Is general enough to catch similar transactions
-3. Uses the most reliable transaction fields (name is usually most reliable)
-4. Considers amount ranges if relevant for this type of transaction
+{_RULE_SYNTAX}
 
 Respond with JSON in this exact format:
 {{
@@ -320,11 +532,7 @@ Respond with JSON in this exact format:
     "confidence": 0.85
 }}
 
-Examples of good rules:
-- name:"STARBUCKS" (matches all Starbucks transactions)
-- name:"SHELL" AND purpose:"FUEL" (gas station fuel purchases)
-- name:"AMAZON" AND amount<50.00 (small Amazon purchases)
-- purpose:"SALARY" OR purpose:"WAGE" (salary payments)
+{_RULE_EXAMPLES}
 
 Respond only with valid JSON."""
 
@@ -335,43 +543,123 @@ Respond only with valid JSON."""
             logger.error(f"Rule generation failed: {e}")
             return None
     
-    def _parse_rule_response(self, llm_response: str) -> Optional[Dict]:
-        """Parse the LLM response for rule generation."""
-        try:
-            # Clean the response - remove thinking tags first
-            cleaned_response = llm_response.strip()
+    def generate_categorization_rules_batch(self, pairs: List[Tuple[Dict, Dict]],
+                                           batch_size: Optional[int] = None) -> List[Optional[Dict]]:
+        """Generate rules for several (transaction, category) pairs per LLM call; returns one rule or None per pair, in order."""
+        batch_size = batch_size or Config.LLM_BATCH_SIZE
+        
+        results = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            prompt = self._build_batch_rule_prompt(batch)
             
-            # Remove thinking tags that some models output
-            import re
-            cleaned_response = re.sub(r'<think>.*?</think>', '', cleaned_response, flags=re.DOTALL)
-            cleaned_response = re.sub(r'<thinking>.*?</thinking>', '', cleaned_response, flags=re.DOTALL)
-            cleaned_response = cleaned_response.strip()
+            try:
+                response = self._call_llm(prompt)
+                results.extend(self._parse_batch_rule_response(response, len(batch)))
+            except Exception as e:
+                logger.error(f"Batch rule generation failed: {e}")
+                results.extend(None for _ in batch)
+        
+        return results
+    
+    def _describe_rule_transaction(self, transaction: Dict) -> str:
+        name = transaction.get('name', 'Unknown')
+        amount = transaction.get('amount', 0)
+        purpose = transaction.get('purpose', '')
+        comment = transaction.get('comment', '')
+        booking_text = transaction.get('bookingText', '')
+        
+        # Build transaction description for rule generation
+        transaction_desc = f"Merchant/Name: {name}\nAmount: {amount}"
+        
+        if purpose:
+            transaction_desc += f"\nDescription: {purpose}"
             
-            # Handle markdown-wrapped JSON
-            if '```json' in cleaned_response:
-                start = cleaned_response.find('```json') + 7
-                end = cleaned_response.find('```', start)
-                if end != -1:
-                    cleaned_response = cleaned_response[start:end].strip()
-            elif '```' in cleaned_response:
-                start = cleaned_response.find('```') + 3
-                end = cleaned_response.find('```', start)
-                if end != -1:
-                    cleaned_response = cleaned_response[start:end].strip()
+        if comment:
+            transaction_desc += f"\nUser Comment: {comment}"
             
-            logger.debug(f"Cleaned rule response: {cleaned_response}")
+        if booking_text:
+            transaction_desc += f"\nBank Booking Text: {booking_text}"
+        
+        return transaction_desc
+    
+    def _build_batch_rule_prompt(self, pairs: List[Tuple[Dict, Dict]]) -> str:
+        transaction_blocks = '\n\n'.join(
+            f"Transaction {i}:\n{self._describe_rule_transaction(transaction)}\n"
+            f"Target Category: {category.get('full_name', 'Unknown')}"
+            for i, (transaction, category) in enumerate(pairs, 1)
+        )
+        
+        prompt = f"""You are an expert at creating MoneyMoney categorization rules. For each of the following {len(pairs)} transactions, generate a precise rule that would automatically categorize similar transactions to its target category.
+
+Transactions to analyze:
+{transaction_blocks}
+
+{_RULE_SYNTAX}
+
+Respond with JSON in this exact format, using the transaction number as id:
+{{
+    "rules": [
+        {{
+            "id": 1,
+            "rule": "exact MoneyMoney rule syntax here",
+            "explanation": "brief explanation of what this rule matches",
+            "confidence": 0.85
+        }}
+    ]
+}}
+
+{_RULE_EXAMPLES}
+
+Respond only with valid JSON."""
+        
+        return prompt
+    
+    def _parse_batch_rule_response(self, llm_response: str, count: int) -> List[Optional[Dict]]:
+        """Split a batch rule reply into one rule (or None) per transaction, by id."""
+        try:
+            cleaned_response = self._clean_llm_response(llm_response)
+            logger.debug(f"Cleaned batch rule response: {cleaned_response}")
             data = json.loads(cleaned_response)
-            
-            # Validate required fields
-            if 'rule' in data and 'explanation' in data and 'confidence' in data:
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse batch rule response as JSON: {e}")
+            logger.error(f"Raw response: {repr(llm_response)}")
+            return [None] * count
+        
+        rules_by_id = {}
+        for rule_data in data.get('rules', []):
+            try:
+                rule_id = int(rule_data.get('id'))
+            except (TypeError, ValueError):
+                continue
+            rules_by_id.setdefault(rule_id, rule_data)
+        
+        return [self._validate_rule(rules_by_id[rule_id]) if rule_id in rules_by_id else None
+                for rule_id in range(1, count + 1)]
+    
+    def _validate_rule(self, data: Dict) -> Optional[Dict]:
+        """Return the rule fields, or None if any required field is missing or malformed."""
+        if 'rule' in data and 'explanation' in data and 'confidence' in data:
+            try:
                 return {
                     'rule': data['rule'],
                     'explanation': data['explanation'],
                     'confidence': float(data['confidence'])
                 }
-            else:
-                logger.error("Rule response missing required fields")
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid rule confidence: {e}")
                 return None
+        
+        logger.error("Rule response missing required fields")
+        return None
+    
+    def _parse_rule_response(self, llm_response: str) -> Optional[Dict]:
+        """Parse the LLM response for rule generation."""
+        try:
+            cleaned_response = self._clean_llm_response(llm_response)
+            logger.debug(f"Cleaned rule response: {cleaned_response}")
+            data = json.loads(cleaned_response)
+            return self._validate_rule(data)
                 
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse rule response as JSON: {e}")
@@ -1,7 +1,9 @@
 import subprocess
 import plistlib
+import tempfile
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional
+from xml.parsers.expat import ExpatError
+from typing import List, Dict, Optional, Tuple
 import logging
 from config import Config
 
@@ -9,6 +11,21 @@ logger = logging.getLogger(__name__)
 
 class MoneyMoneyClient:
     
+    # Single-pass escaping of backslashes and quotes for AppleScript string literals
+    _ESCAPE_TABLE = str.maketrans({'\\': '\\\\', '"': '\\"'})
+    
+    # Transaction export scripts, without and with an end date
+    _EXPORT_TRANSACTIONS_SCRIPT = (
+        'tell application "{app_name}"\n'
+        'export transactions from category "" from date "{from_date}" as "plist"\n'
+        'end tell'
+    )
+    _EXPORT_TRANSACTIONS_TO_SCRIPT = (
+        'tell application "{app_name}"\n'
+        'export transactions from category "" from date "{from_date}" to date "{to_date}" as "plist"\n'
+        'end tell'
+    )
+    
     def __init__(self):
         self.app_name = "MoneyMoney"
         self._accounts_cache = None
@@ -26,13 +43,60 @@ class MoneyMoneyClient:
             logger.error(f"AppleScript error: {e.stderr}")
             raise Exception(f"AppleScript execution failed: {e.stderr}")
     
+    def _run_applescript_plist(self, script: str):
+        """Run an AppleScript export and parse its plist output directly from the stdout pipe.
+        
+        Raises Exception if osascript fails and ValueError if the output is not a valid plist.
+        """
+        # stderr goes to a file so a child writing a lot of it can't block while stdout is parsed
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(
+                ['osascript', '-e', script],
+                stdout=subprocess.PIPE,
+                stderr=stderr_file
+            )
+            parse_error = None
+            try:
+                try:
+                    # Explicit format avoids the header sniffing seek, which pipes don't support
+                    data = plistlib.load(process.stdout, fmt=plistlib.FMT_XML)
+                except (ValueError, ExpatError) as e:
+                    # Covers InvalidFileException as well as malformed values such as <integer>abc</integer>
+                    data = None
+                    parse_error = e
+                
+                # Drain whatever the parser did not consume so the child can exit
+                process.stdout.read()
+            except BaseException:
+                process.kill()
+                raise
+            finally:
+                # Always close the pipe and reap the child
+                process.stdout.close()
+                returncode = process.wait()
+            
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode('utf-8', errors='replace')
+        
+        if returncode != 0:
+            logger.error(f"AppleScript error: {stderr}")
+            raise Exception(f"AppleScript execution failed: {stderr}")
+        
+        if parse_error is not None:
+            raise ValueError(f"Invalid plist output: {parse_error}") from parse_error
+        
+        return data
+    
     def get_categories(self) -> List[Dict]:
         script = f'tell application "{self.app_name}" to export categories'
-        plist_data = self._run_applescript(script)
         
         try:
-            categories = plistlib.loads(plist_data.encode('utf-8'))
-            
+            categories = self._run_applescript_plist(script)
+        except ValueError as e:
+            logger.error(f"Failed to parse categories: {e}")
+            return []
+        
+        try:
             # Debug: Log the raw category structure
             logger.debug(f"Raw categories structure: {len(categories)} categories found")
             
@@ -67,22 +131,26 @@ class MoneyMoneyClient:
     def _flatten_categories(self, categories: List[Dict], parent_path: str = "") -> List[Dict]:
         flattened = []
         
-        for category in categories:
-            name = category.get('name', '')
-            uuid = category.get('uuid', '')
+        # Depth-first walk with an explicit stack; children are pushed reversed to keep export order
+        stack = [(category, parent_path) for category in reversed(categories)]
+        while stack:
+            category, parent_path = stack.pop()
+            get = category.get
+            name = get('name', '')
+            uuid = get('uuid', '')
             
             current_path = f"{parent_path} > {name}" if parent_path else name
             
             # Check if this category has subcategories
-            has_subcategories = 'categories' in category and category['categories']
+            subcategories = get('categories')
             
             # Check if this is a group/folder category (not assignable)
-            is_group = category.get('group', False)
+            is_group = get('group', False)
             
             # Only include categories that are:
             # 1. Leaf nodes (no subcategories) AND
             # 2. Not group categories (assignable)
-            if not has_subcategories and not is_group:
+            if not subcategories and not is_group:
                 flattened.append({
                     'uuid': uuid,
                     'name': name,
@@ -90,11 +158,9 @@ class MoneyMoneyClient:
                     'full_name': current_path
                 })
             
-            # Recursively process subcategories
-            if has_subcategories:
-                flattened.extend(
-                    self._flatten_categories(category['categories'], current_path)
-                )
+            # Visit subcategories next
+            if subcategories:
+                stack.extend((subcategory, current_path) for subcategory in reversed(subcategories))
         
         return flattened
     
@@ -102,9 +168,13 @@ class MoneyMoneyClient:
         """Enhanced category flattening that includes parent context and hierarchy information."""
         flattened = []
         
-        for category in categories:
-            name = category.get('name', '')
-            uuid = category.get('uuid', '')
+        # Depth-first walk with an explicit stack; children are pushed reversed to keep export order
+        stack = [(category, parent_path, parent_path_mm, hierarchy_level) for category in reversed(categories)]
+        while stack:
+            category, parent_path, parent_path_mm, hierarchy_level = stack.pop()
+            get = category.get
+            name = get('name', '')
+            uuid = get('uuid', '')
             
             # Build current path with ' > ' separator for display
             current_path = f"{parent_path} > {name}" if parent_path else name
@@ -113,15 +183,15 @@ class MoneyMoneyClient:
             current_path_mm = f"{parent_path_mm}\\{name}" if parent_path_mm else name
             
             # Check if this category has subcategories
-            has_subcategories = 'categories' in category and category['categories']
+            subcategories = get('categories')
             
             # Check if this is a group/folder category (not assignable)
-            is_group = category.get('group', False)
+            is_group = get('group', False)
             
             # Only include categories that are:
             # 1. Leaf nodes (no subcategories) AND
             # 2. Not group categories (assignable)
-            if not has_subcategories and not is_group:
+            if not subcategories and not is_group:
                 flattened.append({
                     'uuid': uuid,
                     'name': name,
@@ -133,16 +203,12 @@ class MoneyMoneyClient:
                 })
                 logger.debug(f"Added leaf category: '{current_path}' (MM path: '{current_path_mm}', UUID: {uuid})")
             
-            # Recursively process subcategories
-            if has_subcategories:
-                logger.debug(f"Processing subcategories for: '{current_path}' (has {len(category['categories'])} subcategories)")
-                flattened.extend(
-                    self._flatten_categories_with_context(
-                        category['categories'], 
-                        current_path,
-                        current_path_mm,
-                        hierarchy_level + 1
-                    )
+            # Visit subcategories next
+            if subcategories:
+                logger.debug(f"Processing subcategories for: '{current_path}' (has {len(subcategories)} subcategories)")
+                stack.extend(
+                    (subcategory, current_path, current_path_mm, hierarchy_level + 1)
+                    for subcategory in reversed(subcategories)
                 )
         
         return flattened
@@ -150,27 +216,30 @@ class MoneyMoneyClient:
     def _process_indentation_hierarchy(self, categories: List[Dict]) -> List[Dict]:
         """Process MoneyMoney's indentation-based category hierarchy."""
         flattened = []
-        parent_stack = []  # Stack to track parent categories at each level
+        # Display and MoneyMoney paths of the open parent groups, one entry per level
+        parent_paths = []
+        parent_paths_mm = []
         
         for category in categories:
-            name = category.get('name', '')
-            uuid = category.get('uuid', '')
-            indentation = category.get('indentation', 0)
-            is_group = category.get('group', False)
+            get = category.get
+            name = get('name', '')
+            uuid = get('uuid', '')
+            indentation = get('indentation', 0)
+            is_group = get('group', False)
             
-            # Adjust parent stack based on current indentation level
+            # Adjust parent stacks based on current indentation level
             # Keep only parents at levels less than current indentation
-            parent_stack = parent_stack[:indentation]
+            del parent_paths[indentation:]
+            del parent_paths_mm[indentation:]
             
-            # Build the current hierarchy path
-            if parent_stack:
+            # Build the current hierarchy path from the innermost parent's path
+            if parent_paths:
                 # Create display path with ' > ' separator
-                parent_names = [p['name'] for p in parent_stack]
-                current_path = ' > '.join(parent_names + [name])
-                parent_path = ' > '.join(parent_names)
+                parent_path = parent_paths[-1]
+                current_path = f"{parent_path} > {name}"
                 
                 # Create MoneyMoney API path with '\' separator  
-                current_path_mm = '\\'.join(parent_names + [name])
+                current_path_mm = f"{parent_paths_mm[-1]}\\{name}"
             else:
                 # Top-level category
                 current_path = name
@@ -190,12 +259,9 @@ class MoneyMoneyClient:
                 })
                 logger.debug(f"Added leaf category: '{current_path}' (MM path: '{current_path_mm}', UUID: {uuid})")
             else:
-                # Group category - add to parent stack for subsequent categories
-                parent_stack.append({
-                    'name': name,
-                    'uuid': uuid,
-                    'indentation': indentation
-                })
+                # Group category - its paths prefix those of subsequent categories
+                parent_paths.append(current_path)
+                parent_paths_mm.append(current_path_mm)
                 logger.debug(f"Processing group category: '{current_path}' (indentation: {indentation})")
         
         return flattened
@@ -207,8 +273,7 @@ class MoneyMoneyClient:
             
         script = f'tell application "{self.app_name}" to export accounts'
         try:
-            plist_data = self._run_applescript(script)
-            accounts_data = plistlib.loads(plist_data.encode('utf-8'))
+            accounts_data = self._run_applescript_plist(script)
             
             accounts_map = {}
             if isinstance(accounts_data, list):
@@ -225,22 +290,16 @@ class MoneyMoneyClient:
             return {}
     
     def get_uncategorized_transactions(self, from_date: str, to_date: Optional[str] = None) -> List[Dict]:
-        script_parts = [
-            f'tell application "{self.app_name}"',
-            f'export transactions from category "" from date "{from_date}"'
-        ]
-        
-        if to_date:
-            script_parts[1] += f' to date "{to_date}"'
-        
-        script_parts[1] += ' as "plist"'
-        script_parts.append('end tell')
+        template = self._EXPORT_TRANSACTIONS_TO_SCRIPT if to_date else self._EXPORT_TRANSACTIONS_SCRIPT
+        script = template.format(app_name=self.app_name, from_date=from_date, to_date=to_date)
         
-        script = '\n'.join(script_parts)
-        plist_data = self._run_applescript(script)
+        try:
+            data = self._run_applescript_plist(script)
+        except ValueError as e:
+            logger.error(f"Failed to parse transactions: {e}")
+            return []
         
         try:
-            data = plistlib.loads(plist_data.encode('utf-8'))
             all_transactions = []
             
             if isinstance(data, dict) and 'transactions' in data:
@@ -252,23 +311,13 @@ class MoneyMoneyClient:
                 return []
             
             # Filter for truly uncategorized transactions (no category or empty category)
-            uncategorized = []
-            for transaction in all_transactions:
-                category = transaction.get('category', '')
-                # Consider empty string, None, or missing category as uncategorized
-                if not category or category.strip() == '':
-                    uncategorized.append(transaction)
+            # Consider empty string, whitespace, None, or missing category as uncategorized
+            uncategorized = [t for t in all_transactions if not (t.get('category') or '').strip()]
             
             # Filter out pending transactions if configured to do so
             if Config.EXCLUDE_PENDING_TRANSACTIONS:
-                booked_transactions = []
-                pending_count = 0
-                
-                for transaction in uncategorized:
-                    if self._is_transaction_booked(transaction):
-                        booked_transactions.append(transaction)
-                    else:
-                        pending_count += 1
+                booked_transactions = [t for t in uncategorized if self._is_transaction_booked(t)]
+                pending_count = len(uncategorized) - len(booked_transactions)
                 
                 logger.info(f"Found {len(all_transactions)} total transactions, {len(uncategorized)} uncategorized, {pending_count} pending transactions excluded")
                 return booked_transactions
@@ -282,33 +331,22 @@ class MoneyMoneyClient:
     
     def _is_transaction_booked(self, transaction: Dict) -> bool:
         """Determine if a transaction is fully booked (not pending)."""
-        # Check explicit booked flag
+        # An explicit booked flag decides on its own
         booked_flag = transaction.get('booked')
-        if booked_flag is not None:
-            # If explicitly set to False, it's pending
-            if booked_flag is False:
-                return False
-            # If explicitly set to True, it's booked
-            if booked_flag is True:
-                return True
+        if booked_flag is True or booked_flag is False:
+            return booked_flag
         
-        # Check for booking date presence
-        booking_date = transaction.get('bookingDate')
-        if booking_date is not None:
-            # Has a booking date, likely booked
+        # Has a booking date, likely booked
+        if transaction.get('bookingDate') is not None:
             return True
         
-        # If neither booked flag nor booking date is present/reliable,
-        # treat as pending for safety (conservative approach)
-        if booked_flag is None and booking_date is None:
-            return False
-        
-        # Default to booked if we have some indication it's processed
-        return True
+        # Without a booking date, treat as pending for safety (conservative approach)
+        # unless there is some other booked indication
+        return booked_flag is not None
     
     def set_transaction_category(self, transaction_id: int, category_path: str) -> bool:
         # Escape quotes and backslashes in the category path for AppleScript
-        escaped_path = category_path.replace('\\', '\\\\').replace('"', '\\"')
+        escaped_path = category_path.translate(self._ESCAPE_TABLE)
         
         script = f'''tell application "{self.app_name}"
     set transaction id {transaction_id} category to "{escaped_path}"
@@ -322,24 +360,61 @@ end tell'''
             logger.error(f"Failed to set category for transaction {transaction_id}: {e}")
             return False
     
-    def format_transaction(self, transaction: Dict) -> str:
-        name = transaction.get('name', 'Unknown')
-        amount = transaction.get('amount', 0)
-        currency = transaction.get('currency', 'EUR')
+    def set_transaction_categories(self, assignments: List[Tuple[int, str]]) -> List[bool]:
+        """Set categories for several transactions in one osascript run; returns success per assignment, in order."""
+        if not assignments:
+            return []
+        
+        # Each assignment reports its own status so one bad transaction doesn't abort the rest
+        script_lines = [f'tell application "{self.app_name}"', '    set statuses to ""']
+        for transaction_id, category_path in assignments:
+            escaped_path = category_path.translate(self._ESCAPE_TABLE)
+            script_lines += [
+                '    try',
+                f'        set transaction id {transaction_id} category to "{escaped_path}"',
+                '        set statuses to statuses & "ok" & linefeed',
+                '    on error',
+                '        set statuses to statuses & "failed" & linefeed',
+                '    end try',
+            ]
+        script_lines += ['    return statuses', 'end tell']
+        
+        try:
+            statuses = self._run_applescript('\n'.join(script_lines)).splitlines()
+        except Exception as e:
+            logger.error(f"Failed to set categories for {len(assignments)} transactions: {e}")
+            return [False] * len(assignments)
+        
+        results = []
+        for i, (transaction_id, category_path) in enumerate(assignments):
+            success = i < len(statuses) and statuses[i] == 'ok'
+            if success:
+                logger.info(f"Set transaction {transaction_id} to category '{category_path}'")
+            else:
+                logger.error(f"Failed to set category for transaction {transaction_id}")
+            results.append(success)
+        return results
+    
+    def format_transaction(self, transaction: Dict, accounts: Optional[Dict[str, str]] = None) -> str:
+        """Format a transaction for display. Pass accounts to reuse an already resolved account map."""
+        get = transaction.get
+        name = get('name', 'Unknown')
+        amount = get('amount', 0)
+        currency = get('currency', 'EUR')
         
         # Handle both date fields that MoneyMoney provides
-        date = transaction.get('bookingDate') or transaction.get('valueDate') or 'Unknown'
+        date = get('bookingDate') or get('valueDate') or 'Unknown'
         if hasattr(date, 'strftime'):
             date = date.strftime('%Y-%m-%d')
         
-        purpose = transaction.get('purpose', '')
-        comment = transaction.get('comment', '')
-        booking_text = transaction.get('bookingText', '')
+        purpose = get('purpose', '')
+        comment = get('comment', '')
+        booking_text = get('bookingText', '')
         
         # Get account name from UUID
-        account_uuid = transaction.get('accountUuid', '')
-        accounts = self.get_accounts()
-        account = accounts.get(account_uuid, 'Unknown')
+        if accounts is None:
+            accounts = self.get_accounts()
+        account = accounts.get(get('accountUuid', ''), 'Unknown')
         
         # Color codes
         CYAN = '\033[96m'
@@ -353,18 +428,20 @@ end tell'''
         amount_color = GREEN if amount > 0 else RED
         amount_symbol = '💰' if amount > 0 else '💸'
         
-        formatted = f"📅 {CYAN}{BOLD}Date:{RESET} {date}\n"
-        formatted += f"🏦 {CYAN}{BOLD}Account:{RESET} {account}\n"
-        formatted += f"🏪 {CYAN}{BOLD}Name:{RESET} {name}\n"
-        formatted += f"{amount_symbol} {CYAN}{BOLD}Amount:{RESET} {amount_color}{amount:.2f} {currency}{RESET}\n"
+        lines = [
+            f"📅 {CYAN}{BOLD}Date:{RESET} {date}\n",
+            f"🏦 {CYAN}{BOLD}Account:{RESET} {account}\n",
+            f"🏪 {CYAN}{BOLD}Name:{RESET} {name}\n",
+            f"{amount_symbol} {CYAN}{BOLD}Amount:{RESET} {amount_color}{amount:.2f} {currency}{RESET}\n",
+        ]
         
         if purpose:
-            formatted += f"📝 {CYAN}{BOLD}Purpose:{RESET} {purpose}\n"
+            lines.append(f"📝 {CYAN}{BOLD}Purpose:{RESET} {purpose}\n")
         
         if comment:
-            formatted += f"💬 {CYAN}{BOLD}Comment:{RESET} {comment}\n"
+            lines.append(f"💬 {CYAN}{BOLD}Comment:{RESET} {comment}\n")
             
         if booking_text:
-            formatted += f"🏛️ {CYAN}{BOLD}Booking Text:{RESET} {booking_text}\n"
+            lines.append(f"🏛️ {CYAN}{BOLD}Booking Text:{RESET} {booking_text}\n")
         
-        return formatted
\ No newline at end of file
+        return ''.join(lines)
\ No newline at end of file
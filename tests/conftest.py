@@ -1,7 +1,8 @@
 import pytest
 import sys
 import os
-from unittest.mock import patch
+from unittest.mock import patch, create_autospec
+from types import SimpleNamespace
 
 # Add the parent directory to the Python path so we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -18,6 +19,36 @@ def mock_config():
         mock.MAX_SEARCH_RESULTS = 10
         yield mock
 
+@pytest.fixture(scope="session")
+def autospec_clients():
+    """Autospec'd collaborator instances, built once per session"""
+    from moneymoney_client import MoneyMoneyClient
+    from llm_client import LMStudioClient
+    from category_selector import CategorySelector
+    from cache_manager import CacheManager
+    return SimpleNamespace(
+        money=create_autospec(MoneyMoneyClient, instance=True),
+        llm=create_autospec(LMStudioClient, instance=True),
+        selector=create_autospec(CategorySelector, instance=True),
+        cache=create_autospec(CacheManager, instance=True),
+    )
+
+@pytest.fixture
+def fake_applescript(monkeypatch):
+    """Answer MoneyMoneyClient AppleScript calls from a script -> output dict instead of osascript"""
+    from moneymoney_client import MoneyMoneyClient
+    responses = {}
+    
+    def respond(self, script):
+        if script not in responses:
+            pytest.fail(f"Unexpected AppleScript:\n{script}")
+        return responses[script]
+    
+    # Plist exports are answered with already parsed data
+    monkeypatch.setattr(MoneyMoneyClient, '_run_applescript', respond)
+    monkeypatch.setattr(MoneyMoneyClient, '_run_applescript_plist', respond)
+    return responses
+
 @pytest.fixture
 def sample_transaction():
     """Sample transaction for testing"""
@@ -1,10 +1,8 @@
 import pytest
+import copy
 import json
 import os
-import tempfile
-from unittest.mock import patch, mock_open
 import sys
-import shutil
 
 # Add the parent directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,110 +10,121 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from cache_manager import CacheManager
 
 
+@pytest.fixture
+def cache_manager():
+    """In-memory cache manager; no filesystem access."""
+    return CacheManager(storage={})
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    """Path to a cache file inside pytest's temporary directory."""
+    return str(tmp_path / 'test_cache.json')
+
+
+@pytest.fixture
+def file_cache_manager(cache_file):
+    """File-backed cache manager for tests that exercise JSON persistence."""
+    return CacheManager(cache_file)
+
+
+COFFEE_SUGGESTIONS = [
+    {
+        'category': {'uuid': '1', 'full_name': 'Food & Dining\\Coffee'},
+        'confidence': 0.9,
+        'reasoning': 'Coffee shop transaction'
+    }
+]
+
+GAS_SUGGESTIONS = [
+    {
+        'category': {'uuid': '2', 'full_name': 'Transportation\\Gas'},
+        'confidence': 0.8,
+        'reasoning': 'Gas station transaction'
+    }
+]
+
+# On-disk representation of a cache holding three transactions (keys are strings, as in the file)
+GOLDEN_CACHE = {
+    '12345': [{'category': {'uuid': '1', 'full_name': 'Food\\Coffee'}, 'confidence': 0.9}],
+    '12346': [{'category': {'uuid': '2', 'full_name': 'Transport\\Gas'}, 'confidence': 0.8}],
+    '12347': [{'category': {'uuid': '3', 'full_name': 'Shopping\\Groceries'}, 'confidence': 0.7}]
+}
+
+
+def _write_cache_blob(path, data):
+    """Write a cache file in one buffered, compact JSON write."""
+    with open(path, 'w', buffering=65536) as f:
+        json.dump(data, f, separators=(',', ':'))
+
+
+def _load_cache_blob(path):
+    """Read a cache file back for assertions."""
+    with open(path, 'r', buffering=65536) as f:
+        return json.load(f)
+
+
 class TestCacheManager:
     
-    def setup_method(self):
-        """Setup test environment with temporary cache file."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.cache_file = os.path.join(self.temp_dir, 'test_cache.json')
-        self.cache_manager = CacheManager(self.cache_file)
-        
-    def teardown_method(self):
-        """Clean up temporary files."""
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-    
-    def test_cache_creation_and_storage(self):
+    def test_cache_creation_and_storage(self, file_cache_manager, cache_file):
         """Test that cache can be created and data stored."""
         transaction_id = 12345
-        suggestions = [
-            {
-                'category': {'uuid': '1', 'full_name': 'Food & Dining\\Coffee'},
-                'confidence': 0.9,
-                'reasoning': 'Coffee shop transaction'
-            }
-        ]
+        suggestions = COFFEE_SUGGESTIONS
         
         # Store suggestions
-        self.cache_manager.store_suggestions(transaction_id, suggestions)
+        file_cache_manager.store_suggestions(transaction_id, suggestions)
         
         # Verify cache file was created
-        assert os.path.exists(self.cache_file)
+        assert os.path.exists(cache_file)
         
         # Verify data was stored correctly
-        with open(self.cache_file, 'r') as f:
-            cache_data = json.load(f)
+        cache_data = _load_cache_blob(cache_file)
         
         assert str(transaction_id) in cache_data
         assert cache_data[str(transaction_id)] == suggestions
     
-    def test_cache_retrieval_by_transaction_id(self):
-        """Test that cached suggestions can be retrieved by transaction ID."""
+    @pytest.mark.parametrize('suggestions,retrieve_first,remove', [
+        pytest.param(GAS_SUGGESTIONS, True, False, id='store_and_get'),
+        pytest.param(COFFEE_SUGGESTIONS, True, True, id='cleanup_after_categorization'),
+        pytest.param(COFFEE_SUGGESTIONS, False, True, id='cleanup_after_skip'),
+        pytest.param([], True, False, id='empty_suggestions'),
+    ])
+    def test_store_retrieve_and_remove(self, cache_manager, suggestions, retrieve_first, remove):
+        """Test storing suggestions, retrieving them by transaction ID and removing them."""
         transaction_id = 12345
-        suggestions = [
-            {
-                'category': {'uuid': '2', 'full_name': 'Transportation\\Gas'},
-                'confidence': 0.8,
-                'reasoning': 'Gas station transaction'
-            }
-        ]
-        
-        # Store and retrieve
-        self.cache_manager.store_suggestions(transaction_id, suggestions)
-        retrieved = self.cache_manager.get_suggestions(transaction_id)
         
-        assert retrieved == suggestions
+        cache_manager.store_suggestions(transaction_id, suggestions)
+        if retrieve_first:
+            assert cache_manager.get_suggestions(transaction_id) == suggestions
+        
+        if remove:
+            cache_manager.remove_suggestions(transaction_id)
+            assert cache_manager.get_suggestions(transaction_id) is None
     
-    def test_cache_retrieval_nonexistent_transaction(self):
+    def test_cache_retrieval_nonexistent_transaction(self, cache_manager):
         """Test that retrieving non-existent transaction returns None."""
-        result = self.cache_manager.get_suggestions(99999)
+        result = cache_manager.get_suggestions(99999)
         assert result is None
     
-    def test_cache_cleanup_after_categorization(self):
-        """Test that cache entry is removed after transaction is processed."""
-        transaction_id = 12345
-        suggestions = [
-            {
-                'category': {'uuid': '1', 'full_name': 'Food & Dining\\Coffee'},
-                'confidence': 0.9,
-                'reasoning': 'Coffee shop transaction'
-            }
-        ]
+    def test_injected_storage_skips_disk(self, cache_file):
+        """Test that an injected storage mapping holds the cache without touching disk."""
+        storage = {}
+        cache_manager = CacheManager(cache_file, storage=storage)
+        suggestions = [{'test': 'in-memory'}]
         
-        # Store suggestions
-        self.cache_manager.store_suggestions(transaction_id, suggestions)
-        assert self.cache_manager.get_suggestions(transaction_id) is not None
+        cache_manager.store_suggestions(12345, suggestions)
         
-        # Clean up entry
-        self.cache_manager.remove_suggestions(transaction_id)
-        assert self.cache_manager.get_suggestions(transaction_id) is None
-    
-    def test_cache_cleanup_after_skip(self):
-        """Test that cache entry is removed when transaction is skipped."""
-        transaction_id = 12345
-        suggestions = [
-            {
-                'category': {'uuid': '1', 'full_name': 'Food & Dining\\Coffee'},
-                'confidence': 0.9,
-                'reasoning': 'Coffee shop transaction'
-            }
-        ]
-        
-        # Store and then remove (simulating skip)
-        self.cache_manager.store_suggestions(transaction_id, suggestions)
-        self.cache_manager.remove_suggestions(transaction_id)
-        
-        # Verify removal
-        assert self.cache_manager.get_suggestions(transaction_id) is None
+        assert storage == {'12345': suggestions}
+        assert not os.path.exists(cache_file)
     
-    def test_invalid_cache_file_handling(self):
+    def test_invalid_cache_file_handling(self, cache_file):
         """Test handling of corrupted or invalid cache files."""
         # Create invalid JSON file
-        with open(self.cache_file, 'w') as f:
+        with open(cache_file, 'w') as f:
             f.write('invalid json content')
         
         # Should handle gracefully and create new cache
-        cache_manager = CacheManager(self.cache_file)
+        cache_manager = CacheManager(cache_file)
         transaction_id = 12345
         suggestions = [{'test': 'data'}]
         
@@ -125,61 +134,43 @@ class TestCacheManager:
         
         assert result == suggestions
     
-    def test_multiple_transactions_in_cache(self):
-        """Test storing and retrieving multiple transactions."""
-        transactions = {
-            12345: [{'category': {'uuid': '1', 'full_name': 'Food\\Coffee'}, 'confidence': 0.9}],
-            12346: [{'category': {'uuid': '2', 'full_name': 'Transport\\Gas'}, 'confidence': 0.8}],
-            12347: [{'category': {'uuid': '3', 'full_name': 'Shopping\\Groceries'}, 'confidence': 0.7}]
-        }
-        
-        # Store all transactions
-        for tid, suggestions in transactions.items():
-            self.cache_manager.store_suggestions(tid, suggestions)
+    def test_multiple_transactions_in_cache(self, cache_file):
+        """Test retrieving and removing multiple transactions from a cache file."""
+        _write_cache_blob(cache_file, GOLDEN_CACHE)
+        cache_manager = CacheManager(cache_file)
         
         # Verify all can be retrieved
-        for tid, expected_suggestions in transactions.items():
-            retrieved = self.cache_manager.get_suggestions(tid)
+        for tid, expected_suggestions in GOLDEN_CACHE.items():
+            retrieved = cache_manager.get_suggestions(int(tid))
             assert retrieved == expected_suggestions
         
-        # Remove one and verify others remain
-        self.cache_manager.remove_suggestions(12346)
-        assert self.cache_manager.get_suggestions(12346) is None
-        assert self.cache_manager.get_suggestions(12345) is not None
-        assert self.cache_manager.get_suggestions(12347) is not None
+        # Remove one and verify others remain, in memory and on disk
+        cache_manager.remove_suggestions(12346)
+        assert cache_manager.get_suggestions(12346) is None
+        assert cache_manager.get_suggestions(12345) is not None
+        assert cache_manager.get_suggestions(12347) is not None
+        assert set(_load_cache_blob(cache_file)) == {'12345', '12347'}
     
-    def test_cache_persistence_across_instances(self):
+    def test_cache_persistence_across_instances(self, file_cache_manager, cache_file):
         """Test that cache persists across different CacheManager instances."""
         transaction_id = 12345
         suggestions = [{'test': 'persistence'}]
         
         # Store with first instance
-        self.cache_manager.store_suggestions(transaction_id, suggestions)
+        file_cache_manager.store_suggestions(transaction_id, suggestions)
         
         # Create new instance with same cache file
-        new_cache_manager = CacheManager(self.cache_file)
+        new_cache_manager = CacheManager(cache_file)
         retrieved = new_cache_manager.get_suggestions(transaction_id)
         
         assert retrieved == suggestions
     
-    def test_empty_suggestions_handling(self):
-        """Test handling of empty suggestions list."""
-        transaction_id = 12345
-        empty_suggestions = []
-        
-        self.cache_manager.store_suggestions(transaction_id, empty_suggestions)
-        retrieved = self.cache_manager.get_suggestions(transaction_id)
-        
-        assert retrieved == empty_suggestions
-    
     def test_get_all_cached_transaction_ids(self):
         """Test retrieving all cached transaction IDs."""
         transaction_ids = [12345, 12346, 12347]
+        cache_manager = CacheManager(storage=copy.copy(GOLDEN_CACHE))
         
-        for tid in transaction_ids:
-            self.cache_manager.store_suggestions(tid, [{'test': f'data_{tid}'}])
-        
-        cached_ids = self.cache_manager.get_cached_transaction_ids()
+        cached_ids = cache_manager.get_cached_transaction_ids()
         
         # Convert to int for comparison (cache stores as strings)
         cached_ids_int = [int(tid) for tid in cached_ids]
@@ -189,16 +180,14 @@ class TestCacheManager:
     
     def test_clear_all_cache(self):
         """Test clearing entire cache."""
-        # Store multiple transactions
-        for tid in [12345, 12346, 12347]:
-            self.cache_manager.store_suggestions(tid, [{'test': f'data_{tid}'}])
+        cache_manager = CacheManager(storage=copy.copy(GOLDEN_CACHE))
         
         # Verify cache has data
-        assert len(self.cache_manager.get_cached_transaction_ids()) == 3
+        assert len(cache_manager.get_cached_transaction_ids()) == 3
         
         # Clear cache
-        self.cache_manager.clear_cache()
+        cache_manager.clear_cache()
         
         # Verify cache is empty
-        assert len(self.cache_manager.get_cached_transaction_ids()) == 0
-        assert self.cache_manager.get_suggestions(12345) is None
\ No newline at end of file
+        assert len(cache_manager.get_cached_transaction_ids()) == 0
+        assert cache_manager.get_suggestions(12345) is None
\ No newline at end of file
@@ -1,49 +1,157 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from io import StringIO
+import re
 import sys
-import tempfile
-import os
+from unittest.mock import Mock, patch, call
+from types import MappingProxyType
 from categorizer import TransactionCategorizer, main
 
 
+# Read-only sample data shared by all tests in the module
+SAMPLE_CATEGORIES = (
+    MappingProxyType({'uuid': '1', 'full_name': 'Food & Dining\\Coffee'}),
+    MappingProxyType({'uuid': '2', 'full_name': 'Transportation\\Gas'}),
+)
+
+SAMPLE_TRANSACTIONS = (
+    MappingProxyType({
+        'id': 12345,
+        'name': 'STARBUCKS',
+        'amount': -4.50,
+        'currency': 'EUR',
+        'date': '2024-01-15'
+    }),
+    MappingProxyType({
+        'id': 12346,
+        'name': 'SHELL',
+        'amount': -60.00,
+        'currency': 'EUR',
+        'date': '2024-01-16'
+    }),
+)
+
+SAMPLE_SUGGESTIONS = (
+    MappingProxyType({
+        'category': MappingProxyType({'uuid': '1', 'full_name': 'Food & Dining\\Coffee'}),
+        'confidence': 0.9,
+        'reasoning': 'Coffee shop transaction'
+    }),
+)
+
+SAMPLE_TRANSACTION = MappingProxyType({
+    'id': 12345,
+    'name': 'STARBUCKS STORE #12345',
+    'amount': -4.50,
+    'currency': 'EUR',
+    'date': '2024-01-15',
+    'purpose': 'Coffee purchase'
+})
+
+SAMPLE_CATEGORY = MappingProxyType({
+    'uuid': 'coffee-uuid',
+    'full_name': 'Food & Dining\\Coffee'
+})
+
+SAMPLE_RULE = MappingProxyType({
+    'rule': 'name:"STARBUCKS"',
+    'explanation': 'Matches all Starbucks transactions for coffee categorization',
+    'confidence': 0.90
+})
+
+
+# Value separator in coloured console output: whitespace and ANSI colour codes
+_SEP = r'(?:\s|\x1b\[[0-9;]*m)*'
+
+SUMMARY_PATTERN = re.compile(
+    rf'SUMMARY.*Transactions processed:{_SEP}10\b.*Successfully categorized:{_SEP}8\b'
+    rf'.*Skipped:{_SEP}1\b.*Errors:{_SEP}1\b.*Success rate:.*80\.0%',
+    re.S
+)
+
+APPLIED_PATTERN = re.compile(r'Applying category: Food & Dining > Coffee\n.*✅ Category applied successfully', re.S)
+
+# The single MoneyMoney write expected when the sample transaction is categorized as coffee
+SET_COFFEE_CATEGORY = call(12345, 'Food & Dining\\Coffee')
+
+EXPECTED_INIT_OUTPUT = ('Initializing...', 'Loaded 2 categories')
+
+# Either progress message is acceptable for the pre-run phase
+EXPECTED_PRE_RUN_PROGRESS = ('Processing transaction', 'Pre-processing')
+
+
+@pytest.fixture(scope="session")
+def sample_categories():
+    return SAMPLE_CATEGORIES
+
+
+@pytest.fixture(scope="session")
+def sample_transactions():
+    return SAMPLE_TRANSACTIONS
+
+
+@pytest.fixture(scope="session")
+def sample_suggestions():
+    return SAMPLE_SUGGESTIONS
+
+
+@pytest.fixture(scope="session")
+def sample_transaction():
+    return SAMPLE_TRANSACTION
+
+
+@pytest.fixture(scope="session")
+def sample_category():
+    return SAMPLE_CATEGORY
+
+
+@pytest.fixture(scope="session")
+def sample_rule():
+    return SAMPLE_RULE
+
+
+@pytest.fixture(scope="class")
+def _client_patches(autospec_clients):
+    """Install the session's autospec'd collaborator mocks once per test class."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('categorizer.MoneyMoneyClient', lambda *args, **kwargs: autospec_clients.money)
+        mp.setattr('categorizer.LMStudioClient', lambda *args, **kwargs: autospec_clients.llm)
+        mp.setattr('categorizer.CategorySelector', lambda *args, **kwargs: autospec_clients.selector)
+        mp.setattr('categorizer.CacheManager', lambda *args, **kwargs: autospec_clients.cache)
+        yield autospec_clients
+
+
+@pytest.fixture
+def mock_clients(_client_patches):
+    """Shared collaborator mocks, reset to a clean state for each test."""
+    for mock in vars(_client_patches).values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    return _client_patches
+
+
+@pytest.fixture
+def wired_clients(mock_clients, sample_transactions):
+    """Collaborator mocks prewired for a run: LM Studio reachable, one category, sample transactions."""
+    mock_clients.money.get_categories.return_value = [{'uuid': '1', 'full_name': 'Food\\Coffee'}]
+    mock_clients.money.get_uncategorized_transactions.return_value = sample_transactions
+    mock_clients.llm.test_connection.return_value = True
+    return mock_clients
+
+
+@pytest.fixture
+def fresh_categorizer(mock_clients):
+    """Default categorizer for tests that mutate its state."""
+    return TransactionCategorizer('2024-01-01')
+
+
+@pytest.fixture(scope="class")
+def default_categorizer(_client_patches):
+    """Categorizer built with default arguments, for tests that only read its state."""
+    return TransactionCategorizer('2024-01-01')
+
+
 class TestTransactionCategorizer:
     
-    def setup_method(self):
-        self.sample_categories = [
-            {'uuid': '1', 'full_name': 'Food & Dining\\Coffee'},
-            {'uuid': '2', 'full_name': 'Transportation\\Gas'}
-        ]
-        
-        self.sample_transactions = [
-            {
-                'id': 12345,
-                'name': 'STARBUCKS',
-                'amount': -4.50,
-                'currency': 'EUR',
-                'date': '2024-01-15'
-            },
-            {
-                'id': 12346,
-                'name': 'SHELL',
-                'amount': -60.00,
-                'currency': 'EUR',
-                'date': '2024-01-16'
-            }
-        ]
-        
-        self.sample_suggestions = [
-            {
-                'category': {'uuid': '1', 'full_name': 'Food & Dining\\Coffee'},
-                'confidence': 0.9,
-                'reasoning': 'Coffee shop transaction'
-            }
-        ]
-    
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    def test_init_default_values(self, mock_llm, mock_money):
-        categorizer = TransactionCategorizer('2024-01-01')
+    def test_init_default_values(self, default_categorizer):
+        categorizer = default_categorizer
         
         assert categorizer.from_date == '2024-01-01'
         assert categorizer.to_date is None
@@ -53,219 +161,124 @@ class TestTransactionCategorizer:
         assert categorizer.stats['skipped'] == 0
         assert categorizer.stats['errors'] == 0
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    def test_init_with_all_params(self, mock_llm, mock_money):
+    def test_init_with_all_params(self, mock_clients):
         categorizer = TransactionCategorizer('2024-01-01', '2024-01-31', True)
         
         assert categorizer.from_date == '2024-01-01'
         assert categorizer.to_date == '2024-01-31'
         assert categorizer.dry_run is True
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
     @patch('builtins.input', return_value='')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_initialize_success(self, mock_stdout, mock_input, mock_llm, mock_money):
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = self.sample_categories
-        mock_money.return_value = mock_money_instance
+    def test_initialize_success(self, mock_input, mock_clients, fresh_categorizer, sample_categories, capsys):
+        mock_clients.llm.test_connection.return_value = True
+        mock_clients.money.get_categories.return_value = sample_categories
         
-        categorizer = TransactionCategorizer('2024-01-01')
+        categorizer = fresh_categorizer
         result = categorizer._initialize()
         
         assert result is True
         assert len(categorizer.categories) == 2
         assert categorizer.category_selector is not None
         
-        output = mock_stdout.getvalue()
-        assert 'Initializing...' in output
-        assert 'Loaded 2 categories' in output
+        output = capsys.readouterr().out
+        assert all(expected in output for expected in EXPECTED_INIT_OUTPUT)
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_initialize_llm_connection_failure(self, mock_stdout, mock_llm, mock_money):
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = False
-        mock_llm.return_value = mock_llm_instance
-        
-        categorizer = TransactionCategorizer('2024-01-01')
+    def test_initialize_llm_connection_failure(self, mock_clients, fresh_categorizer, capsys):
+        mock_clients.llm.test_connection.return_value = False
+        
+        categorizer = fresh_categorizer
         result = categorizer._initialize()
         
         assert result is False
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         assert 'Cannot connect to LM Studio' in output
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_initialize_no_categories(self, mock_stdout, mock_llm, mock_money):
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = []
-        mock_money.return_value = mock_money_instance
-        
-        categorizer = TransactionCategorizer('2024-01-01')
+    def test_initialize_no_categories(self, mock_clients, fresh_categorizer, capsys):
+        mock_clients.llm.test_connection.return_value = True
+        mock_clients.money.get_categories.return_value = []
+        
+        categorizer = fresh_categorizer
         result = categorizer._initialize()
         
         assert result is False
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         assert 'No categories found in MoneyMoney' in output
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    def test_load_transactions_success(self, mock_llm, mock_money):
-        mock_money_instance = Mock()
-        mock_money_instance.get_uncategorized_transactions.return_value = self.sample_transactions
-        mock_money.return_value = mock_money_instance
+    def test_load_transactions_success(self, mock_clients, sample_transactions):
+        mock_clients.money.get_uncategorized_transactions.return_value = sample_transactions
         
         categorizer = TransactionCategorizer('2024-01-01', '2024-01-31')
         result = categorizer._load_transactions()
         
         assert len(result) == 2
-        mock_money_instance.get_uncategorized_transactions.assert_called_once_with('2024-01-01', '2024-01-31')
+        mock_clients.money.get_uncategorized_transactions.assert_called_once_with('2024-01-01', '2024-01-31')
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_load_transactions_error(self, mock_stdout, mock_llm, mock_money):
-        mock_money_instance = Mock()
-        mock_money_instance.get_uncategorized_transactions.side_effect = Exception("Database error")
-        mock_money.return_value = mock_money_instance
-        
-        categorizer = TransactionCategorizer('2024-01-01')
+    def test_load_transactions_error(self, mock_clients, fresh_categorizer, capsys):
+        mock_clients.money.get_uncategorized_transactions.side_effect = Exception("Database error")
+        
+        categorizer = fresh_categorizer
         result = categorizer._load_transactions()
         
         assert result == []
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         assert 'Error loading transactions: Database error' in output
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
-    def test_process_single_transaction_success(self, mock_selector_class, mock_llm, mock_money):
-        mock_llm_instance = Mock()
-        mock_llm_instance.categorize_transaction.return_value = self.sample_suggestions
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_money_instance = Mock()
-        mock_money_instance.set_transaction_category.return_value = True
-        mock_money.return_value = mock_money_instance
-        
-        mock_selector = Mock()
-        mock_selector.get_user_choice.return_value = {
+    def test_process_single_transaction_success(self, mock_clients, fresh_categorizer, sample_categories, sample_transactions, sample_suggestions):
+        mock_clients.llm.categorize_transaction.return_value = sample_suggestions
+        mock_clients.money.set_transaction_category.return_value = True
+        mock_clients.selector.get_user_choice.return_value = {
             'action': 'categorize',
             'category': {'uuid': '1', 'full_name': 'Food & Dining > Coffee', 'moneymoney_path': 'Food & Dining\\Coffee'}
         }
-        mock_selector_class.return_value = mock_selector
         
-        categorizer = TransactionCategorizer('2024-01-01')
-        categorizer.categories = self.sample_categories
-        categorizer.category_selector = mock_selector
+        categorizer = fresh_categorizer
+        categorizer.categories = sample_categories
+        categorizer.category_selector = mock_clients.selector
         
-        result = categorizer._process_single_transaction(self.sample_transactions[0])
+        result = categorizer._process_single_transaction(sample_transactions[0])
         
         assert result is True
-        mock_llm_instance.categorize_transaction.assert_called_once()
-        mock_selector.display_suggestions.assert_called_once_with(self.sample_suggestions)
-        mock_money_instance.set_transaction_category.assert_called_once_with(12345, 'Food & Dining\\Coffee')
+        mock_clients.llm.categorize_transaction.assert_called_once()
+        mock_clients.selector.display_suggestions.assert_called_once_with(sample_suggestions)
+        assert mock_clients.money.set_transaction_category.call_args_list == [SET_COFFEE_CATEGORY]
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
-    def test_process_single_transaction_skip(self, mock_selector_class, mock_llm, mock_money):
-        mock_llm_instance = Mock()
-        mock_llm_instance.categorize_transaction.return_value = self.sample_suggestions
-        mock_llm.return_value = mock_llm_instance
+    def test_process_single_transaction_skip(self, mock_clients, fresh_categorizer, sample_categories, sample_transactions, sample_suggestions):
+        mock_clients.llm.categorize_transaction.return_value = sample_suggestions
+        mock_clients.selector.get_user_choice.return_value = {'action': 'skip'}
         
-        mock_selector = Mock()
-        mock_selector.get_user_choice.return_value = {'action': 'skip'}
-        mock_selector_class.return_value = mock_selector
+        categorizer = fresh_categorizer
+        categorizer.categories = sample_categories
+        categorizer.category_selector = mock_clients.selector
         
-        categorizer = TransactionCategorizer('2024-01-01')
-        categorizer.categories = self.sample_categories
-        categorizer.category_selector = mock_selector
-        
-        result = categorizer._process_single_transaction(self.sample_transactions[0])
+        result = categorizer._process_single_transaction(sample_transactions[0])
         
         assert result is False
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_apply_categorization_success(self, mock_stdout, mock_llm, mock_money):
-        mock_money_instance = Mock()
-        mock_money_instance.set_transaction_category.return_value = True
-        mock_money.return_value = mock_money_instance
-        
-        categorizer = TransactionCategorizer('2024-01-01')
+    @pytest.mark.parametrize('dry_run,transaction,money_return,expected_result,expected_output,expect_api_call', [
+        pytest.param(False, SAMPLE_TRANSACTIONS[0], True, True, APPLIED_PATTERN, True, id='success'),
+        pytest.param(True, SAMPLE_TRANSACTIONS[0], None, True, 'DRY RUN: Would categorize transaction', False, id='dry_run'),
+        pytest.param(False, MappingProxyType({'name': 'Test'}), None, False, 'Transaction ID not found', False, id='no_transaction_id'),
+        pytest.param(False, SAMPLE_TRANSACTIONS[0], False, False, '❌ Failed to apply category', True, id='failure'),
+    ])
+    def test_apply_categorization(self, mock_clients, capsys, dry_run, transaction, money_return,
+                                  expected_result, expected_output, expect_api_call):
+        mock_clients.money.set_transaction_category.return_value = money_return
+        
+        categorizer = TransactionCategorizer('2024-01-01', dry_run=dry_run)
         category = {'full_name': 'Food & Dining > Coffee', 'moneymoney_path': 'Food & Dining\\Coffee'}
         
-        result = categorizer._apply_categorization(self.sample_transactions[0], category)
+        result = categorizer._apply_categorization(transaction, category)
         
-        assert result is True
-        output = mock_stdout.getvalue()
-        assert 'Applying category: Food & Dining > Coffee' in output
-        assert '✅ Category applied successfully' in output
-        mock_money_instance.set_transaction_category.assert_called_once_with(12345, 'Food & Dining\\Coffee')
+        assert result is expected_result
+        output = capsys.readouterr().out
+        assert re.search(expected_output, output)
+        if expect_api_call:
+            assert mock_clients.money.set_transaction_category.call_args_list == [SET_COFFEE_CATEGORY]
+        else:
+            mock_clients.money.set_transaction_category.assert_not_called()
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_apply_categorization_dry_run(self, mock_stdout, mock_llm, mock_money):
-        categorizer = TransactionCategorizer('2024-01-01', dry_run=True)
-        category = {'full_name': 'Food & Dining\\Coffee'}
-        
-        result = categorizer._apply_categorization(self.sample_transactions[0], category)
-        
-        assert result is True
-        output = mock_stdout.getvalue()
-        assert 'DRY RUN: Would categorize transaction' in output
-    
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_apply_categorization_no_transaction_id(self, mock_stdout, mock_llm, mock_money):
-        categorizer = TransactionCategorizer('2024-01-01')
-        category = {'full_name': 'Food & Dining\\Coffee'}
-        transaction_without_id = {'name': 'Test'}
-        
-        result = categorizer._apply_categorization(transaction_without_id, category)
-        
-        assert result is False
-        output = mock_stdout.getvalue()
-        assert 'Transaction ID not found' in output
-    
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_apply_categorization_failure(self, mock_stdout, mock_llm, mock_money):
-        mock_money_instance = Mock()
-        mock_money_instance.set_transaction_category.return_value = False
-        mock_money.return_value = mock_money_instance
-        
-        categorizer = TransactionCategorizer('2024-01-01')
-        category = {'full_name': 'Food & Dining\\Coffee'}
-        
-        result = categorizer._apply_categorization(self.sample_transactions[0], category)
-        
-        assert result is False
-        output = mock_stdout.getvalue()
-        assert '❌ Failed to apply category' in output
-    
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_summary(self, mock_stdout, mock_llm, mock_money):
-        categorizer = TransactionCategorizer('2024-01-01')
+    def test_print_summary(self, fresh_categorizer, capsys):
+        categorizer = fresh_categorizer
         categorizer.stats = {
             'processed': 10,
             'categorized': 8,
@@ -275,33 +288,40 @@ class TestTransactionCategorizer:
         
         categorizer._print_summary()
         
-        output = mock_stdout.getvalue()
-        assert 'SUMMARY' in output
-        assert 'Transactions processed:' in output and '10' in output
-        assert 'Successfully categorized:' in output and '8' in output
-        assert 'Skipped:' in output and '1' in output
-        assert 'Errors:' in output and '1' in output
-        assert 'Success rate:' in output and '80.0%' in output
+        output = capsys.readouterr().out
+        assert SUMMARY_PATTERN.search(output)
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_summary_no_transactions(self, mock_stdout, mock_llm, mock_money):
-        categorizer = TransactionCategorizer('2024-01-01')
+    def test_print_summary_no_transactions(self, default_categorizer, capsys):
+        categorizer = default_categorizer
         
         categorizer._print_summary()
         
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         assert 'Transactions processed:' in output and '0' in output
         assert 'Success rate:' not in output
 
 
+@pytest.fixture
+def argv(monkeypatch, request):
+    """Command line for main(), taken from the test's indirect parametrization."""
+    monkeypatch.setattr(sys, 'argv', request.param)
+    return request.param
+
+
 class TestMain:
     
+    @pytest.mark.parametrize('argv,side_effect,expected_args,expected_output', [
+        pytest.param(['categorizer.py'], None, {'to_date': None, 'dry_run': False}, None, id='default_args'),
+        pytest.param(['categorizer.py', '--from-date', '2024-01-01', '--to-date', '2024-01-31', '--dry-run'], None,
+                     {'from_date': '2024-01-01', 'to_date': '2024-01-31', 'dry_run': True}, None, id='all_args'),
+        pytest.param(['categorizer.py'], KeyboardInterrupt, {}, "\nOperation cancelled by user.\n", id='keyboard_interrupt'),
+        pytest.param(['categorizer.py'], Exception("Test error"), {}, "Error: Test error\n", id='general_exception'),
+    ], indirect=['argv'])
+    @patch('sys.exit')
     @patch('categorizer.TransactionCategorizer')
-    @patch('sys.argv', ['categorizer.py'])
-    def test_main_default_args(self, mock_categorizer_class):
-        mock_categorizer = Mock()
+    def test_main(self, mock_categorizer_class, mock_exit, argv, side_effect, expected_args, expected_output, capsys):
+        mock_categorizer = Mock(spec=TransactionCategorizer)
+        mock_categorizer.run.side_effect = side_effect
         mock_categorizer_class.return_value = mock_categorizer
         
         main()
@@ -309,114 +329,25 @@ class TestMain:
         mock_categorizer_class.assert_called_once()
         call_args = mock_categorizer_class.call_args[1]
         assert 'from_date' in call_args
-        assert call_args['to_date'] is None
-        assert call_args['dry_run'] is False
+        for name, value in expected_args.items():
+            assert call_args[name] == value
         mock_categorizer.run.assert_called_once()
-    
-    @patch('categorizer.TransactionCategorizer')
-    @patch('sys.argv', ['categorizer.py', '--from-date', '2024-01-01', '--to-date', '2024-01-31', '--dry-run'])
-    def test_main_with_all_args(self, mock_categorizer_class):
-        mock_categorizer = Mock()
-        mock_categorizer_class.return_value = mock_categorizer
-        
-        main()
-        
-        call_args = mock_categorizer_class.call_args[1]
-        assert call_args['from_date'] == '2024-01-01'
-        assert call_args['to_date'] == '2024-01-31'
-        assert call_args['dry_run'] is True
-    
-    @patch('categorizer.TransactionCategorizer')
-    @patch('sys.argv', ['categorizer.py'])
-    @patch('sys.exit')
-    def test_main_keyboard_interrupt(self, mock_exit, mock_categorizer_class):
-        mock_categorizer = Mock()
-        mock_categorizer.run.side_effect = KeyboardInterrupt()
-        mock_categorizer_class.return_value = mock_categorizer
-        
-        with patch('builtins.print') as mock_print:
-            main()
         
-        mock_print.assert_called_with("\nOperation cancelled by user.")
-        mock_exit.assert_called_with(1)
-    
-    @patch('categorizer.TransactionCategorizer')
-    @patch('sys.argv', ['categorizer.py'])
-    @patch('sys.exit')
-    def test_main_general_exception(self, mock_exit, mock_categorizer_class):
-        mock_categorizer = Mock()
-        mock_categorizer.run.side_effect = Exception("Test error")
-        mock_categorizer_class.return_value = mock_categorizer
-        
-        with patch('builtins.print') as mock_print:
-            main()
-        
-        mock_print.assert_called_with("Error: Test error")
-        mock_exit.assert_called_with(1)
+        if expected_output:
+            assert capsys.readouterr().out.endswith(expected_output)
+            mock_exit.assert_called_with(1)
+        else:
+            mock_exit.assert_not_called()
 
 
 class TestCombinedModeWorkflow:
     """Test the combined pre-run + apply mode functionality."""
     
-    def setup_method(self):
-        self.temp_dir = tempfile.mkdtemp()
-        self.cache_file = os.path.join(self.temp_dir, 'test_cache.json')
-        
-        self.sample_transactions = [
-            {
-                'id': 12345,
-                'name': 'STARBUCKS',
-                'amount': -4.50,
-                'currency': 'EUR',
-                'date': '2024-01-15'
-            },
-            {
-                'id': 12346,
-                'name': 'SHELL',
-                'amount': -60.00,
-                'currency': 'EUR',
-                'date': '2024-01-16'
-            }
-        ]
-        
-        self.sample_suggestions = [
-            {
-                'category': {'uuid': '1', 'full_name': 'Food & Dining\\Coffee'},
-                'confidence': 0.9,
-                'reasoning': 'Coffee shop transaction'
-            }
-        ]
-    
-    def teardown_method(self):
-        """Clean up temporary files."""
-        import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-    
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
-    @patch('categorizer.CacheManager')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_combined_mode_default_behavior(self, mock_stdout, mock_cache_manager, mock_selector, mock_llm, mock_money):
+    def test_combined_mode_default_behavior(self, wired_clients, sample_suggestions):
         """Test that combined mode is the default behavior without flags."""
         # Setup mocks
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = [{'uuid': '1', 'full_name': 'Food\\Coffee'}]
-        mock_money_instance.get_uncategorized_transactions.return_value = self.sample_transactions
-        mock_money.return_value = mock_money_instance
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm_instance.categorize_transaction.return_value = self.sample_suggestions
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_cache_instance = Mock()
-        mock_cache_manager.return_value = mock_cache_instance
-        
-        mock_selector_instance = Mock()
-        mock_selector_instance.get_user_choice.return_value = {'action': 'skip'}
-        mock_selector.return_value = mock_selector_instance
+        wired_clients.llm.categorize_transaction.return_value = sample_suggestions
+        wired_clients.selector.get_user_choice.return_value = {'action': 'skip'}
         
         # Test combined mode (default)
         categorizer = TransactionCategorizer('2024-01-01', combined_mode=True)
@@ -425,25 +356,10 @@ class TestCombinedModeWorkflow:
             categorizer.run()
             mock_combined.assert_called_once()
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CacheManager')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_pre_run_only_mode(self, mock_stdout, mock_cache_manager, mock_llm, mock_money):
+    def test_pre_run_only_mode(self, wired_clients, sample_suggestions):
         """Test pre-run only mode generates and caches suggestions."""
         # Setup mocks
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = [{'uuid': '1', 'full_name': 'Food\\Coffee'}]
-        mock_money_instance.get_uncategorized_transactions.return_value = self.sample_transactions
-        mock_money.return_value = mock_money_instance
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm_instance.categorize_transaction.return_value = self.sample_suggestions
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_cache_instance = Mock()
-        mock_cache_manager.return_value = mock_cache_instance
+        wired_clients.llm.categorize_transaction.return_value = sample_suggestions
         
         # Test pre-run only mode
         categorizer = TransactionCategorizer('2024-01-01', pre_run_only=True)
@@ -452,31 +368,12 @@ class TestCombinedModeWorkflow:
             categorizer.run()
             mock_pre_run.assert_called_once()
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
-    @patch('categorizer.CacheManager')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_apply_only_mode_with_cache(self, mock_stdout, mock_cache_manager, mock_selector, mock_llm, mock_money):
+    def test_apply_only_mode_with_cache(self, wired_clients, sample_suggestions):
         """Test apply-only mode uses cached suggestions."""
         # Setup mocks
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = [{'uuid': '1', 'full_name': 'Food\\Coffee'}]
-        mock_money_instance.get_uncategorized_transactions.return_value = self.sample_transactions
-        mock_money.return_value = mock_money_instance
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_cache_instance = Mock()
-        mock_cache_instance.get_suggestions.return_value = self.sample_suggestions
-        mock_cache_instance.get_cached_transaction_ids.return_value = ['12345', '12346']
-        mock_cache_manager.return_value = mock_cache_instance
-        
-        mock_selector_instance = Mock()
-        mock_selector_instance.get_user_choice.return_value = {'action': 'skip'}
-        mock_selector.return_value = mock_selector_instance
+        wired_clients.cache.get_suggestions.return_value = sample_suggestions
+        wired_clients.cache.get_cached_transaction_ids.return_value = ['12345', '12346']
+        wired_clients.selector.get_user_choice.return_value = {'action': 'skip'}
         
         # Test apply-only mode
         categorizer = TransactionCategorizer('2024-01-01', apply_only=True)
@@ -485,225 +382,118 @@ class TestCombinedModeWorkflow:
             categorizer.run()
             mock_apply.assert_called_once()
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CacheManager')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_apply_only_mode_without_cache(self, mock_stdout, mock_cache_manager, mock_llm, mock_money):
+    def test_apply_only_mode_without_cache(self, wired_clients, capsys):
         """Test apply-only mode fails gracefully without cache."""
         # Setup mocks
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = [{'uuid': '1', 'full_name': 'Food\\Coffee'}]
-        mock_money_instance.get_uncategorized_transactions.return_value = self.sample_transactions
-        mock_money.return_value = mock_money_instance
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_cache_instance = Mock()
-        mock_cache_instance.get_cached_transaction_ids.return_value = []
-        mock_cache_manager.return_value = mock_cache_instance
+        wired_clients.cache.get_cached_transaction_ids.return_value = []
         
         # Test apply-only mode without cache
         categorizer = TransactionCategorizer('2024-01-01', apply_only=True)
         categorizer.run()
         
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         assert 'No cached suggestions found' in output
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CacheManager')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_progress_display_during_pre_run(self, mock_stdout, mock_cache_manager, mock_llm, mock_money):
+    def test_progress_display_during_pre_run(self, wired_clients, sample_suggestions, capsys):
         """Test that progress is displayed during pre-run phase."""
         # Setup mocks
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = [{'uuid': '1', 'full_name': 'Food\\Coffee'}]
-        mock_money_instance.get_uncategorized_transactions.return_value = self.sample_transactions
-        mock_money.return_value = mock_money_instance
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm_instance.categorize_transaction.return_value = self.sample_suggestions
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_cache_instance = Mock()
-        mock_cache_manager.return_value = mock_cache_instance
+        wired_clients.llm.categorize_transaction.return_value = sample_suggestions
         
         # Test progress display
         categorizer = TransactionCategorizer('2024-01-01', pre_run_only=True)
         categorizer._initialize()
         categorizer._run_pre_run_only()
         
-        output = mock_stdout.getvalue()
-        assert 'Processing transaction' in output or 'Pre-processing' in output
+        output = capsys.readouterr().out
+        assert any(expected in output for expected in EXPECTED_PRE_RUN_PROGRESS)
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
-    @patch('categorizer.CacheManager')
-    def test_cache_cleanup_on_transaction_completion(self, mock_cache_manager, mock_selector, mock_llm, mock_money):
+    def test_cache_cleanup_on_transaction_completion(self, wired_clients, fresh_categorizer, sample_transactions, sample_suggestions):
         """Test that cache entries are cleaned up after transaction processing."""
         # Setup mocks
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = [{'uuid': '1', 'full_name': 'Food\\Coffee'}]
-        mock_money_instance.set_transaction_category.return_value = True
-        mock_money.return_value = mock_money_instance
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_cache_instance = Mock()
-        mock_cache_instance.get_suggestions.return_value = self.sample_suggestions
-        mock_cache_manager.return_value = mock_cache_instance
-        
-        mock_selector_instance = Mock()
-        mock_selector_instance.get_user_choice.return_value = {
+        wired_clients.money.set_transaction_category.return_value = True
+        wired_clients.cache.get_suggestions.return_value = sample_suggestions
+        wired_clients.selector.get_user_choice.return_value = {
             'action': 'categorize',
             'category': {'uuid': '1', 'full_name': 'Food\\Coffee'}
         }
-        mock_selector.return_value = mock_selector_instance
         
         # Test cache cleanup using the cached transaction method
-        categorizer = TransactionCategorizer('2024-01-01')
-        categorizer.cache_manager = mock_cache_instance
-        categorizer.category_selector = mock_selector_instance
+        categorizer = fresh_categorizer
+        categorizer.category_selector = wired_clients.selector
         
         # Simulate processing a transaction with cache
-        success = categorizer._process_single_transaction_cached(self.sample_transactions[0])
+        success = categorizer._process_single_transaction_cached(sample_transactions[0])
         
         # Verify cache cleanup was called
         assert success is True
-        mock_cache_instance.remove_suggestions.assert_called_with(12345)
+        wired_clients.cache.remove_suggestions.assert_called_with(12345)
 
 
 class TestRuleProposalWorkflow:
     """Test AI rule proposal functionality."""
     
-    def setup_method(self):
-        self.sample_transaction = {
-            'id': 12345,
-            'name': 'STARBUCKS STORE #12345',
-            'amount': -4.50,
-            'currency': 'EUR',
-            'date': '2024-01-15',
-            'purpose': 'Coffee purchase'
-        }
-        
-        self.sample_category = {
-            'uuid': 'coffee-uuid',
-            'full_name': 'Food & Dining\\Coffee'
-        }
-        
-        self.sample_rule = {
-            'rule': 'name:"STARBUCKS"',
-            'explanation': 'Matches all Starbucks transactions for coffee categorization',
-            'confidence': 0.90
-        }
-    
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
-    @patch('categorizer.CacheManager')
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_rule_proposal_after_categorization(self, mock_stdout, mock_cache_manager, mock_selector, mock_llm, mock_money):
+    def test_rule_proposal_after_categorization(self, wired_clients, fresh_categorizer, sample_transaction, sample_category, sample_rule):
         """Test that rule proposal is offered after successful categorization."""
         # Setup mocks
-        mock_money_instance = Mock()
-        mock_money_instance.get_categories.return_value = [self.sample_category]
-        mock_money_instance.set_transaction_category.return_value = True
-        mock_money.return_value = mock_money_instance
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.test_connection.return_value = True
-        mock_llm_instance.generate_categorization_rule.return_value = self.sample_rule
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_cache_instance = Mock()
-        mock_cache_instance.get_suggestions.return_value = []
-        mock_cache_manager.return_value = mock_cache_instance
-        
-        mock_selector_instance = Mock()
-        mock_selector_instance.get_user_choice.return_value = {
+        wired_clients.money.get_categories.return_value = [sample_category]
+        wired_clients.money.set_transaction_category.return_value = True
+        wired_clients.llm.generate_categorization_rule.return_value = sample_rule
+        wired_clients.cache.get_suggestions.return_value = []
+        wired_clients.selector.get_user_choice.return_value = {
             'action': 'categorize',
-            'category': self.sample_category
+            'category': sample_category
         }
-        mock_selector_instance.offer_rule_generation.return_value = True
-        mock_selector.return_value = mock_selector_instance
+        wired_clients.selector.offer_rule_generation.return_value = True
         
         # Test rule proposal workflow
-        categorizer = TransactionCategorizer('2024-01-01')
-        categorizer.cache_manager = mock_cache_instance
-        categorizer.category_selector = mock_selector_instance
-        categorizer.llm_client = mock_llm_instance
+        categorizer = fresh_categorizer
+        categorizer.category_selector = wired_clients.selector
         
         # Process transaction with rule proposal
         with patch.object(categorizer, '_propose_rule_generation') as mock_propose:
-            success = categorizer._process_single_transaction_cached(self.sample_transaction)
+            success = categorizer._process_single_transaction_cached(sample_transaction)
             
             assert success is True
             mock_propose.assert_called_once()
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
     @patch('subprocess.run')
-    def test_rule_proposal_user_acceptance(self, mock_subprocess, mock_selector, mock_llm, mock_money):
+    def test_rule_proposal_user_acceptance(self, mock_subprocess, mock_clients, fresh_categorizer, sample_transaction, sample_category, sample_rule):
         """Test user accepting rule proposal and copying to clipboard."""
         # Setup mocks
         mock_subprocess.return_value.returncode = 0  # pbcopy success
-        
-        mock_llm_instance = Mock()
-        mock_llm_instance.generate_categorization_rule.return_value = self.sample_rule
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_selector_instance = Mock()
-        mock_selector_instance.offer_rule_generation.return_value = True
-        mock_selector_instance.display_rule_proposal.return_value = 'copy'
-        mock_selector.return_value = mock_selector_instance
+        mock_clients.llm.generate_categorization_rule.return_value = sample_rule
+        mock_clients.selector.offer_rule_generation.return_value = True
+        mock_clients.selector.display_rule_proposal.return_value = 'copy'
         
         # Test rule proposal acceptance
-        categorizer = TransactionCategorizer('2024-01-01')
-        categorizer.llm_client = mock_llm_instance
-        categorizer.category_selector = mock_selector_instance
+        categorizer = fresh_categorizer
+        categorizer.category_selector = mock_clients.selector
         
-        categorizer._propose_rule_generation(self.sample_transaction, self.sample_category)
+        categorizer._propose_rule_generation(sample_transaction, sample_category)
         
-        mock_llm_instance.generate_categorization_rule.assert_called_once()
-        mock_selector_instance.display_rule_proposal.assert_called_once()
+        mock_clients.llm.generate_categorization_rule.assert_called_once()
+        mock_clients.selector.display_rule_proposal.assert_called_once()
         # Note: clipboard copy is handled by the category selector, not the categorizer
     
-    @patch('categorizer.MoneyMoneyClient')
-    @patch('categorizer.LMStudioClient')
-    @patch('categorizer.CategorySelector')
-    def test_rule_proposal_user_rejection(self, mock_selector, mock_llm, mock_money):
+    def test_rule_proposal_user_rejection(self, mock_clients, fresh_categorizer, sample_transaction, sample_category):
         """Test user rejecting rule proposal."""
-        mock_llm_instance = Mock()
-        mock_llm.return_value = mock_llm_instance
-        
-        mock_selector_instance = Mock()
-        mock_selector_instance.offer_rule_generation.return_value = False
-        mock_selector.return_value = mock_selector_instance
+        mock_clients.selector.offer_rule_generation.return_value = False
         
         # Test rule proposal rejection
-        categorizer = TransactionCategorizer('2024-01-01')
-        categorizer.llm_client = mock_llm_instance
-        categorizer.category_selector = mock_selector_instance
+        categorizer = fresh_categorizer
+        categorizer.category_selector = mock_clients.selector
         
-        categorizer._propose_rule_generation(self.sample_transaction, self.sample_category)
+        categorizer._propose_rule_generation(sample_transaction, sample_category)
         
         # Should not generate rule if user rejects
-        mock_llm_instance.generate_categorization_rule.assert_not_called()
+        mock_clients.llm.generate_categorization_rule.assert_not_called()
     
     @patch('subprocess.run')
-    def test_clipboard_copy_functionality(self, mock_subprocess):
+    def test_clipboard_copy_functionality(self, mock_subprocess, fresh_categorizer):
         """Test clipboard copy functionality."""
         mock_subprocess.return_value.returncode = 0
         
-        categorizer = TransactionCategorizer('2024-01-01')
+        categorizer = fresh_categorizer
         test_rule = 'name:"STARBUCKS"'
         
         success = categorizer._copy_to_clipboard(test_rule)
@@ -715,13 +505,13 @@ class TestRuleProposalWorkflow:
         assert test_rule.encode() == call_args[1]['input']
     
     @patch('subprocess.run')
-    def test_clipboard_copy_failure(self, mock_subprocess):
+    def test_clipboard_copy_failure(self, mock_subprocess, fresh_categorizer):
         """Test clipboard copy failure handling."""
         mock_subprocess.side_effect = Exception("pbcopy failed")
         
-        categorizer = TransactionCategorizer('2024-01-01')
+        categorizer = fresh_categorizer
         test_rule = 'name:"STARBUCKS"'
         
         success = categorizer._copy_to_clipboard(test_rule)
         
-        assert success is False
\ No newline at end of file
+        assert success is False
@@ -1,57 +1,152 @@
 import pytest
 import json
+import threading
+import time
+import requests
 from unittest.mock import Mock, patch, MagicMock
+from types import MappingProxyType, SimpleNamespace
 from llm_client import LMStudioClient
 
 
+SAMPLE_TRANSACTION = MappingProxyType({
+    'name': 'STARBUCKS STORE #12345',
+    'amount': -4.50,
+    'purpose': 'Coffee purchase'
+})
+
+SAMPLE_CATEGORIES = (
+    MappingProxyType({'uuid': '123', 'full_name': 'Food & Dining\\Coffee', 'name': 'Coffee'}),
+    MappingProxyType({'uuid': '456', 'full_name': 'Transportation\\Gas', 'name': 'Gas'}),
+    MappingProxyType({'uuid': '789', 'full_name': 'Shopping\\Groceries', 'name': 'Groceries'})
+)
+
+
+def _suggestion(path, uuid, confidence=0.8, reasoning="Test"):
+    """One entry of the "suggestions" list in an LLM categorization reply."""
+    return {"category_path": path, "uuid": uuid, "confidence": confidence, "reasoning": reasoning}
+
+
+# LLM replies, serialized once at import
+COFFEE_SUGGESTION_RESPONSE = json.dumps({"suggestions": [
+    _suggestion("Food & Dining\\Coffee", "123", 0.9, "Starbucks is a coffee shop"),
+]})
+
+UNKNOWN_CATEGORY_RESPONSE = json.dumps({"suggestions": [
+    _suggestion("Nonexistent Category", "999"),
+]})
+
+DUPLICATE_UUID_RESPONSE = json.dumps({"suggestions": [
+    _suggestion("Food & Dining\\Coffee", "123", 0.9, "First suggestion"),
+    _suggestion("Food & Dining\\Coffee", "123", 0.8, "Duplicate suggestion"),
+    _suggestion("Entertainment\\Movies", "456", 0.7, "Different category"),
+]})
+
+
+# Parsed response bodies shared by the HTTP tests; read-only so no test can alter another's
+LLM_OK_PAYLOAD = MappingProxyType({'choices': ({'message': {'content': 'test response'}},)})
+
+SINGLE_MODEL_PAYLOAD = MappingProxyType({'data': ({'id': 'test-model'},)})
+
+
+def _json_response(payload):
+    """Plain stand-in for a successful requests.Response carrying a JSON body."""
+    return SimpleNamespace(json=lambda: payload, raise_for_status=lambda: None)
+
+
+def _offline_session():
+    """Bare session stand-in for clients whose HTTP calls are patched out."""
+    return SimpleNamespace(headers={})
+
+
+@pytest.fixture(scope='module')
+def readonly_client():
+    """One client for the tests that never change its state."""
+    return LMStudioClient()
+
+
+@pytest.fixture
+def client():
+    """Fresh client for tests that set attributes such as model."""
+    return LMStudioClient(session=_offline_session())
+
+
 class TestLMStudioClient:
     
-    def setup_method(self):
-        self.client = LMStudioClient()
-        self.sample_transaction = {
-            'name': 'STARBUCKS STORE #12345',
-            'amount': -4.50,
-            'purpose': 'Coffee purchase'
-        }
-        self.sample_categories = [
-            {'uuid': '123', 'full_name': 'Food & Dining\\Coffee', 'name': 'Coffee'},
-            {'uuid': '456', 'full_name': 'Transportation\\Gas', 'name': 'Gas'},
-            {'uuid': '789', 'full_name': 'Shopping\\Groceries', 'name': 'Groceries'}
-        ]
+    @pytest.fixture(autouse=True)
+    def _sample_data(self, readonly_client):
+        self.client = readonly_client
+        self.sample_transaction = SAMPLE_TRANSACTION
+        self.sample_categories = SAMPLE_CATEGORIES
     
     def test_init(self):
         assert self.client.base_url == 'http://localhost:1234/v1'
         assert self.client.session is not None
         assert self.client.session.headers['Content-Type'] == 'application/json'
     
+    @patch('llm_client.Config.LLM_MAX_PARALLEL', 32)
+    def test_init_sizes_connection_pool_for_parallelism(self):
+        client = LMStudioClient()
+        
+        for url in (client.base_url, 'https://lmstudio.example/v1'):
+            assert client.session.get_adapter(url)._pool_maxsize == 32
+    
+    def test_init_with_injected_session(self):
+        session = _offline_session()
+        
+        client = LMStudioClient(session=session)
+        
+        assert client.session is session
+        assert session.headers['Content-Type'] == 'application/json'
+    
     @patch('llm_client.Config.LM_STUDIO_BASE_URL', 'http://custom:8080/v1')
     def test_custom_base_url(self):
-        client = LMStudioClient()
+        client = LMStudioClient(session=_offline_session())
         assert client.base_url == 'http://custom:8080/v1'
     
     def test_format_categories_for_prompt(self):
         result = self.client._format_categories_for_prompt(self.sample_categories)
         expected_lines = [
-            '- Food & Dining\\Coffee (UUID: 123)',
-            '- Transportation\\Gas (UUID: 456)',
-            '- Shopping\\Groceries (UUID: 789)'
+            '- [1] Food & Dining\\Coffee',
+            '- [2] Transportation\\Gas',
+            '- [3] Shopping\\Groceries'
         ]
         assert result == '\n'.join(expected_lines)
     
+    def test_format_categories_for_prompt_cached_per_list(self, client):
+        categories = list(self.sample_categories)
+        
+        with patch.object(client, '_render_categories', wraps=client._render_categories) as mock_render:
+            first = client._format_categories_for_prompt(categories)
+            second = client._format_categories_for_prompt(categories)
+            other = client._format_categories_for_prompt(categories[:1])
+        
+        assert first == second
+        assert other == '- [1] Food & Dining\\Coffee'
+        assert mock_render.call_count == 2
+    
     def test_build_categorization_prompt(self):
         category_list = "- Food & Dining\\Coffee (UUID: 123)"
-        prompt = self.client._build_categorization_prompt(self.sample_transaction, category_list)
+        system_prompt = self.client._build_categorization_system_prompt(category_list)
+        prompt = self.client._build_categorization_prompt(self.sample_transaction)
         
         assert 'STARBUCKS STORE #12345' in prompt
         assert '-4.5' in prompt
         assert 'Coffee purchase' in prompt
-        assert 'Food & Dining\\Coffee' in prompt
-        assert '"suggestions":' in prompt
+        assert 'Food & Dining\\Coffee' in system_prompt
+        assert '"suggestions":' in system_prompt
+        assert 'STARBUCKS' not in system_prompt  # stable across transactions so the server can reuse it
+    
+    def test_build_categorization_system_prompt_reused_for_same_list(self, client):
+        category_list = client._format_categories_for_prompt(self.sample_categories)
+        
+        first = client._build_categorization_system_prompt(category_list)
+        
+        assert client._build_categorization_system_prompt(category_list) is first
+        assert client._build_categorization_system_prompt("- Other (UUID: 1)") is not first
     
     def test_build_categorization_prompt_missing_fields(self):
         incomplete_transaction = {'name': 'Test Transaction'}
-        category_list = "- Category (UUID: 123)"
-        prompt = self.client._build_categorization_prompt(incomplete_transaction, category_list)
+        prompt = self.client._build_categorization_prompt(incomplete_transaction)
         
         assert 'Test Transaction' in prompt
         assert 'Amount: 0' in prompt
@@ -60,10 +155,7 @@ class TestLMStudioClient:
     
     @patch('requests.Session.post')
     def test_call_llm_success(self, mock_post):
-        mock_response = Mock()
-        mock_response.json.return_value = {
-            'choices': [{'message': {'content': 'test response'}}]
-        }
+        mock_response = _json_response(LLM_OK_PAYLOAD)
         mock_post.return_value = mock_response
         
         result = self.client._call_llm("test prompt")
@@ -78,6 +170,18 @@ class TestLMStudioClient:
         assert payload['temperature'] == 0.3
         assert payload['max_tokens'] == 8000
     
+    @patch('requests.Session.post')
+    def test_call_llm_with_system_prompt(self, mock_post):
+        mock_post.return_value = _json_response(LLM_OK_PAYLOAD)
+        
+        self.client._call_llm("transaction", system_prompt="instructions")
+        
+        messages = mock_post.call_args[1]['json']['messages']
+        assert messages == [
+            {'role': 'system', 'content': 'instructions'},
+            {'role': 'user', 'content': 'transaction'},
+        ]
+    
     @patch('requests.Session.post')
     def test_call_llm_network_error(self, mock_post):
         mock_post.side_effect = Exception("Network error")
@@ -86,70 +190,42 @@ class TestLMStudioClient:
             self.client._call_llm("test prompt")
     
     def test_parse_suggestions_valid_json(self):
-        llm_response = json.dumps({
-            "suggestions": [
-                {
-                    "category_path": "Food & Dining\\Coffee",
-                    "uuid": "123",
-                    "confidence": 0.9,
-                    "reasoning": "Starbucks is a coffee shop"
-                }
-            ]
-        })
-        
-        result = self.client._parse_suggestions(llm_response, self.sample_categories)
+        result = self.client._parse_suggestions(COFFEE_SUGGESTION_RESPONSE, self.sample_categories)
         
         assert len(result) == 1
         assert result[0]['category']['uuid'] == '123'
         assert result[0]['confidence'] == 0.9
         assert result[0]['reasoning'] == "Starbucks is a coffee shop"
     
+    def test_parse_suggestions_resolves_category_id(self):
+        response = json.dumps({"suggestions": [
+            {"category_id": 2, "category_path": "Transportation\\Gas", "confidence": 0.7, "reasoning": "Fuel"},
+            {"category_id": "3", "confidence": 0.5, "reasoning": "Shop"},
+        ]})
+        result = self.client._parse_suggestions(response, self.sample_categories)
+        
+        assert [s['category']['uuid'] for s in result] == ['456', '789']
+    
+    def test_parse_suggestions_category_id_path_mismatch_falls_back_to_path(self):
+        response = json.dumps({"suggestions": [
+            {"category_id": 3, "category_path": "Food & Dining\\Coffee", "confidence": 0.7, "reasoning": "Coffee"},
+        ]})
+        result = self.client._parse_suggestions(response, self.sample_categories)
+        
+        assert result[0]['category']['uuid'] == '123'
+    
     def test_parse_suggestions_invalid_json(self):
         invalid_json = "Not valid JSON"
         result = self.client._parse_suggestions(invalid_json, self.sample_categories)
         assert result == []
     
     def test_parse_suggestions_no_matching_category(self):
-        llm_response = json.dumps({
-            "suggestions": [
-                {
-                    "category_path": "Nonexistent Category",
-                    "uuid": "999",
-                    "confidence": 0.8,
-                    "reasoning": "Test"
-                }
-            ]
-        })
-        
-        result = self.client._parse_suggestions(llm_response, self.sample_categories)
+        result = self.client._parse_suggestions(UNKNOWN_CATEGORY_RESPONSE, self.sample_categories)
         assert result == []
     
     def test_parse_suggestions_removes_duplicate_uuids(self):
         """Test that duplicate category UUIDs are filtered out."""
-        llm_response = json.dumps({
-            "suggestions": [
-                {
-                    "category_path": "Food & Dining\\Coffee",
-                    "uuid": "123",
-                    "confidence": 0.9,
-                    "reasoning": "First suggestion"
-                },
-                {
-                    "category_path": "Food & Dining\\Coffee",
-                    "uuid": "123",
-                    "confidence": 0.8,
-                    "reasoning": "Duplicate suggestion"
-                },
-                {
-                    "category_path": "Entertainment\\Movies",
-                    "uuid": "456",
-                    "confidence": 0.7,
-                    "reasoning": "Different category"
-                }
-            ]
-        })
-        
-        result = self.client._parse_suggestions(llm_response, self.sample_categories)
+        result = self.client._parse_suggestions(DUPLICATE_UUID_RESPONSE, self.sample_categories)
         
         # Should only have 2 suggestions (duplicate UUID removed)
         assert len(result) == 2
@@ -165,38 +241,39 @@ class TestLMStudioClient:
         assert coffee_suggestion['confidence'] == 0.9
         assert coffee_suggestion['reasoning'] == "First suggestion"
     
-    def test_find_category_by_uuid(self):
-        result = self.client._find_category_by_path_or_uuid(
-            self.sample_categories, "", "123"
-        )
-        assert result['uuid'] == '123'
-        assert result['full_name'] == 'Food & Dining\\Coffee'
-    
-    def test_find_category_by_path(self):
-        result = self.client._find_category_by_path_or_uuid(
-            self.sample_categories, "Food & Dining\\Coffee", ""
-        )
-        assert result['uuid'] == '123'
-    
-    def test_find_category_by_partial_path(self):
-        result = self.client._find_category_by_path_or_uuid(
-            self.sample_categories, "coffee", ""
-        )
-        assert result['uuid'] == '123'
+    @pytest.mark.parametrize('path,uuid,expected_uuid', [
+        pytest.param('', '123', '123', id='by_uuid'),
+        pytest.param('Food & Dining\\Coffee', '', '123', id='by_path'),
+        pytest.param('coffee', '', '123', id='by_partial_path'),
+        pytest.param('Nonexistent', '999', None, id='not_found'),
+    ])
+    def test_find_category(self, path, uuid, expected_uuid):
+        result = self.client._find_category_by_path_or_uuid(self.sample_categories, path, uuid)
+        
+        if expected_uuid is None:
+            assert result is None
+        else:
+            assert result['uuid'] == expected_uuid
+            assert result['full_name'] == 'Food & Dining\\Coffee'
+    
+    def test_find_category_exact_match_beats_earlier_partial(self, client):
+        categories = [
+            {'uuid': '1', 'full_name': 'Food & Dining\\Coffee Shops', 'name': 'Coffee Shops'},
+            {'uuid': '2', 'full_name': 'Food & Dining\\Coffee', 'name': 'Coffee'},
+        ]
+        
+        assert client._find_category_by_path_or_uuid(categories, 'Food & Dining\\Coffee', '')['uuid'] == '2'
+        assert client._find_category_by_path_or_uuid(categories, 'coffee', '')['uuid'] == '1'
+        assert client._index_categories(categories) is client._index_categories(categories)
     
-    def test_find_category_not_found(self):
-        result = self.client._find_category_by_path_or_uuid(
-            self.sample_categories, "Nonexistent", "999"
-        )
-        assert result is None
+    def test_find_category_partial_match_is_casefolded(self, client):
+        categories = [{'uuid': '1', 'full_name': 'Auto\\Straßenmaut', 'name': 'Straßenmaut'}]
+        
+        assert client._find_category_by_path_or_uuid(categories, 'STRASSENMAUT', '')['uuid'] == '1'
     
     @patch('requests.Session.get')
     def test_test_connection_success(self, mock_get):
-        mock_response = Mock()
-        mock_response.raise_for_status.return_value = None
-        mock_response.json.return_value = {
-            'data': [{'id': 'test-model'}]
-        }
+        mock_response = _json_response(SINGLE_MODEL_PAYLOAD)
         mock_get.return_value = mock_response
         
         result = self.client.test_connection()
@@ -213,40 +290,148 @@ class TestLMStudioClient:
         result = self.client.test_connection()
         assert result is False
     
-    @patch.object(LMStudioClient, '_call_llm')
-    @patch.object(LMStudioClient, '_parse_suggestions')
-    def test_categorize_transaction_success(self, mock_parse, mock_call):
-        mock_call.return_value = "mock llm response"
+    def test_categorize_transaction_success(self, client, monkeypatch):
         mock_suggestions = [{'category': {'uuid': '123'}, 'confidence': 0.9}]
-        mock_parse.return_value = mock_suggestions
+        prompts, parsed = [], []
+        monkeypatch.setattr(LMStudioClient, '_call_llm',
+                            lambda self, prompt, system_prompt=None: prompts.append(prompt) or "mock llm response")
+        monkeypatch.setattr(LMStudioClient, '_parse_suggestions',
+                            lambda self, response, categories: parsed.append((response, categories)) or mock_suggestions)
         
-        result = self.client.categorize_transaction(
+        result = client.categorize_transaction(
             self.sample_transaction, self.sample_categories
         )
         
         assert result == mock_suggestions[:5]
-        mock_call.assert_called_once()
-        mock_parse.assert_called_once_with("mock llm response", self.sample_categories)
+        assert len(prompts) == 1
+        assert parsed == [("mock llm response", self.sample_categories)]
     
     @patch.object(LMStudioClient, '_call_llm')
-    def test_categorize_transaction_llm_error(self, mock_call):
+    def test_categorize_transaction_llm_error(self, mock_call, client):
         mock_call.side_effect = Exception("LLM error")
         
-        result = self.client.categorize_transaction(
+        result = client.categorize_transaction(
             self.sample_transaction, self.sample_categories
         )
         
         assert result == []
     
+    @patch.object(LMStudioClient, '_call_llm', return_value=COFFEE_SUGGESTION_RESPONSE)
+    def test_categorize_transaction_reuses_suggestions_for_similar_transaction(self, mock_call, client):
+        first = client.categorize_transaction(self.sample_transaction, self.sample_categories)
+        again = client.categorize_transaction({**self.sample_transaction, 'id': 2, 'amount': -4.80},
+                                              self.sample_categories)
+        
+        assert mock_call.call_count == 1
+        assert again == first
+        assert [s['category']['uuid'] for s in again] == ['123']
+    
+    @pytest.mark.parametrize('changes', [
+        pytest.param({'name': 'SHELL'}, id='other_merchant'),
+        pytest.param({'amount': 4.50}, id='income'),
+        pytest.param({'amount': -45.00}, id='other_amount_range'),
+        pytest.param({'comment': 'Team lunch'}, id='other_comment'),
+    ])
+    @patch.object(LMStudioClient, '_call_llm', return_value=COFFEE_SUGGESTION_RESPONSE)
+    def test_categorize_transaction_asks_again_for_different_transaction(self, mock_call, client, changes):
+        client.categorize_transaction(self.sample_transaction, self.sample_categories)
+        client.categorize_transaction({**self.sample_transaction, **changes}, self.sample_categories)
+        
+        assert mock_call.call_count == 2
+    
+    @patch.object(LMStudioClient, '_call_llm', return_value=COFFEE_SUGGESTION_RESPONSE)
+    def test_categorize_transaction_cache_is_per_category_list(self, mock_call, client):
+        client.categorize_transaction(self.sample_transaction, self.sample_categories)
+        client.categorize_transaction(self.sample_transaction, list(self.sample_categories))
+        
+        assert mock_call.call_count == 2
+    
+    @patch.object(LMStudioClient, '_call_llm', side_effect=[Exception("LLM error"), COFFEE_SUGGESTION_RESPONSE])
+    def test_categorize_transaction_does_not_cache_failures(self, mock_call, client):
+        assert client.categorize_transaction(self.sample_transaction, self.sample_categories) == []
+        assert client.categorize_transaction(self.sample_transaction, self.sample_categories) != []
+    
+    def test_categorize_transactions_batch_one_call_per_batch(self, monkeypatch):
+        transactions = [
+            {'name': 'STARBUCKS', 'amount': -4.50},
+            {'name': 'SHELL', 'amount': -60.00},
+            {'name': 'REWE', 'amount': -23.10},
+        ]
+        replies = [
+            json.dumps({'results': [
+                {'query_id': 2, 'suggestions': [_suggestion("Transportation\\Gas", "456")]},
+                {'query_id': 1, 'suggestions': [_suggestion("Food & Dining\\Coffee", "123")]},
+            ]}),
+            json.dumps({'results': [
+                {'query_id': 1, 'suggestions': [_suggestion("Shopping\\Groceries", "789")]},
+            ]}),
+        ]
+        prompts = []
+        monkeypatch.setattr(LMStudioClient, '_call_llm',
+                            lambda self, prompt, system_prompt=None: prompts.append((prompt, system_prompt))
+                            or replies[len(prompts) - 1])
+        
+        results = self.client.categorize_transactions_batch(transactions, self.sample_categories, batch_size=2)
+        
+        assert len(prompts) == 2
+        (first_prompt, first_system), (_, second_system) = prompts
+        assert first_system is second_system
+        assert first_system == self.client._build_categorization_system_prompt(
+            self.client._format_categories_for_prompt(self.sample_categories))
+        assert 'Food & Dining\\Coffee' not in first_prompt
+        assert 'Transaction 2:\nMerchant/Name: SHELL' in first_prompt
+        assert [[s['category']['uuid'] for s in suggestions] for suggestions in results] == [['123'], ['456'], ['789']]
+    
+    @pytest.mark.parametrize('reply', [
+        pytest.param('Not valid JSON', id='invalid_json'),
+        pytest.param(json.dumps({'results': [{'query_id': 'x', 'suggestions': []}]}), id='bad_query_id'),
+    ])
+    def test_categorize_transactions_batch_unusable_reply(self, monkeypatch, reply):
+        monkeypatch.setattr(LMStudioClient, '_call_llm', lambda self, prompt, system_prompt=None: reply)
+        
+        results = self.client.categorize_transactions_batch([dict(SAMPLE_TRANSACTION)] * 2, self.sample_categories)
+        
+        assert results == [[], []]
+    
+    @patch.object(LMStudioClient, '_call_llm')
+    def test_categorize_transactions_batch_llm_error(self, mock_call):
+        mock_call.side_effect = Exception("LLM error")
+        
+        results = self.client.categorize_transactions_batch([self.sample_transaction], self.sample_categories)
+        
+        assert results == [[]]
+    
+    def test_categorize_transactions_parallel_overlaps_calls(self, client, monkeypatch):
+        transactions = [{'name': 'STARBUCKS'}, {'name': 'SHELL'}, {'name': 'REWE'}]
+        replies = {
+            'STARBUCKS': json.dumps({'suggestions': [_suggestion("Food & Dining\\Coffee", "123")]}),
+            'SHELL': json.dumps({'suggestions': [_suggestion("Transportation\\Gas", "456")]}),
+            'REWE': json.dumps({'suggestions': [_suggestion("Shopping\\Groceries", "789")]}),
+        }
+        # Every call waits until all three are in flight, so a serial implementation times out
+        in_flight = threading.Barrier(len(transactions), timeout=5)
+        
+        def fake_call(self, prompt, system_prompt=None):
+            in_flight.wait()
+            return next(reply for name, reply in replies.items() if f"Merchant/Name: {name}" in prompt)
+        
+        monkeypatch.setattr(LMStudioClient, '_call_llm', fake_call)
+        
+        results = client.categorize_transactions_parallel(transactions, self.sample_categories, max_workers=3)
+        
+        assert [[s['category']['uuid'] for s in suggestions] for suggestions in results] == [['123'], ['456'], ['789']]
+    
+    def test_categorize_transactions_parallel_empty(self):
+        assert self.client.categorize_transactions_parallel([], self.sample_categories) == []
+    
     @patch('requests.Session.get')
     def test_get_available_models_success(self, mock_get):
-        mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_response = _json_response({
             'data': [
                 {'id': 'deepseek/deepseek-r1-0528-qwen3-8b'},
                 {'id': 'google/gemma-3-1b'}
             ]
-        }
+        })
         mock_get.return_value = mock_response
         
         models = self.client._get_available_models()
@@ -263,59 +448,50 @@ class TestLMStudioClient:
         
         assert models == []
     
-    @patch.object(LMStudioClient, '_get_available_models')
-    def test_get_model_to_use_configured(self, mock_get_models):
-        self.client.model = 'configured-model'
-        
-        model = self.client._get_model_to_use()
-        
-        assert model == 'configured-model'
-        mock_get_models.assert_not_called()
-    
-    @patch.object(LMStudioClient, '_get_available_models')
-    def test_get_model_to_use_single_model(self, mock_get_models):
-        self.client.model = None
-        mock_get_models.return_value = ['single-model']
-        
-        model = self.client._get_model_to_use()
-        
-        assert model == 'single-model'
+    @pytest.mark.parametrize('configured,available,expected', [
+        pytest.param('configured-model', None, 'configured-model', id='configured'),
+        pytest.param(None, ['single-model'], 'single-model', id='single_model'),
+        pytest.param(None, ['text-model', 'chat-model', 'instruct-model'], 'chat-model', id='prefer_chat_model'),
+        pytest.param(None, ['first-model', 'second-model'], 'first-model', id='first_model_fallback'),
+        pytest.param(None, [], None, id='no_models'),
+    ])
+    def test_get_model_to_use(self, client, configured, available, expected):
+        client.model = configured
+        
+        with patch.object(LMStudioClient, '_get_available_models', return_value=available) as mock_get_models:
+            model = client._get_model_to_use()
+        
+        assert model == expected
+        if configured:
+            mock_get_models.assert_not_called()
+    
+    def test_get_model_to_use_caches_detected_model(self, client):
+        client.model = None
+        
+        with patch.object(LMStudioClient, '_get_available_models', return_value=['single-model']) as mock_get_models, \
+                patch('llm_client.time.monotonic', side_effect=[100.0, 130.0, 200.0, 200.0]):
+            assert client._get_model_to_use() == 'single-model'
+            assert client._get_model_to_use() == 'single-model'  # within the TTL
+            assert mock_get_models.call_count == 1
+            assert client._get_model_to_use() == 'single-model'  # expired
+            assert mock_get_models.call_count == 2
+    
+    def test_call_llm_http_error_forgets_detected_model(self, client):
+        client._model_cache = ('stale-model', time.monotonic())
+        error_response = SimpleNamespace(status_code=404, text='model not found')
+        client.session.post = Mock(return_value=SimpleNamespace(
+            raise_for_status=Mock(side_effect=requests.exceptions.HTTPError(response=error_response))
+        ))
+        
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._call_llm("test prompt")
+        
+        assert client._model_cache == (None, 0.0)
     
-    @patch.object(LMStudioClient, '_get_available_models')
-    def test_get_model_to_use_prefer_chat_model(self, mock_get_models):
-        self.client.model = None
-        mock_get_models.return_value = ['text-model', 'chat-model', 'instruct-model']
-        
-        model = self.client._get_model_to_use()
-        
-        assert model == 'chat-model'
-    
-    @patch.object(LMStudioClient, '_get_available_models')
-    def test_get_model_to_use_first_model_fallback(self, mock_get_models):
-        self.client.model = None
-        mock_get_models.return_value = ['first-model', 'second-model']
-        
-        model = self.client._get_model_to_use()
-        
-        assert model == 'first-model'
-    
-    @patch.object(LMStudioClient, '_get_available_models')
-    def test_get_model_to_use_no_models(self, mock_get_models):
-        self.client.model = None
-        mock_get_models.return_value = []
-        
-        model = self.client._get_model_to_use()
-        
-        assert model is None
-    
-    @patch.object(LMStudioClient, '_get_model_to_use')
     @patch('requests.Session.post')
-    def test_call_llm_with_model(self, mock_post, mock_get_model):
-        mock_get_model.return_value = 'test-model'
-        mock_response = Mock()
-        mock_response.json.return_value = {
-            'choices': [{'message': {'content': 'test response'}}]
-        }
+    def test_call_llm_with_model(self, mock_post, monkeypatch):
+        monkeypatch.setattr(LMStudioClient, '_get_model_to_use', lambda self: 'test-model')
+        mock_response = _json_response(LLM_OK_PAYLOAD)
         mock_post.return_value = mock_response
         
         result = self.client._call_llm("test prompt")
@@ -334,7 +510,7 @@ class TestRuleGeneration:
             mock_config.LM_STUDIO_BASE_URL = 'http://localhost:1234/v1'
             mock_config.LM_STUDIO_MODEL = None
             mock_config.NUM_SUGGESTIONS = 5
-            self.client = LMStudioClient()
+            self.client = LMStudioClient(session=_offline_session())
         
         self.sample_transaction = {
             'id': 12345,
@@ -496,6 +672,44 @@ class TestRuleGeneration:
         assert 'FUEL' in result['rule']
         assert 'amount>' in result['rule']
         assert result['confidence'] > 0.9
+    
+    @patch.object(LMStudioClient, '_call_llm')
+    def test_generate_categorization_rules_batch_one_call(self, mock_call_llm):
+        """Test that several pairs are sent in one prompt and rules come back by id."""
+        gas_category = {'uuid': 'gas-uuid', 'full_name': 'Transportation\\Gas'}
+        pairs = [
+            (self.sample_transaction, self.sample_category),
+            ({'name': 'SHELL 1234567', 'amount': -85.50}, gas_category),
+            ({'name': 'UNKNOWN', 'amount': -1.00}, gas_category),
+        ]
+        mock_call_llm.return_value = json.dumps({"rules": [
+            {"id": 2, "rule": 'name:"SHELL"', "explanation": "Shell", "confidence": 0.9},
+            {"id": 1, "rule": 'name:"STARBUCKS"', "explanation": "Starbucks", "confidence": 0.95},
+            {"id": 3, "rule": 'name:"UNKNOWN"', "explanation": "Missing confidence"},
+        ]})
+        
+        result = self.client.generate_categorization_rules_batch(pairs, batch_size=3)
+        
+        assert mock_call_llm.call_count == 1
+        prompt = mock_call_llm.call_args[0][0]
+        assert 'Transaction 2:\nMerchant/Name: SHELL 1234567' in prompt
+        assert 'Target Category: Food & Dining\\Coffee' in prompt
+        assert [r['rule'] if r else None for r in result] == ['name:"STARBUCKS"', 'name:"SHELL"', None]
+    
+    @patch.object(LMStudioClient, '_call_llm')
+    def test_generate_categorization_rules_batch_failed_call(self, mock_call_llm):
+        """Test that a failed batch yields None for each of its pairs only."""
+        mock_call_llm.side_effect = [
+            Exception("LLM call failed"),
+            json.dumps({"rules": [{"id": 1, "rule": 'name:"SHELL"', "explanation": "Shell", "confidence": 0.9}]}),
+        ]
+        pairs = [(self.sample_transaction, self.sample_category)] * 3
+        
+        result = self.client.generate_categorization_rules_batch(pairs, batch_size=2)
+        
+        assert mock_call_llm.call_count == 2
+        assert result[:2] == [None, None]
+        assert result[2]['rule'] == 'name:"SHELL"'
 
 
 class TestEnhancedCategorization:
@@ -506,7 +720,7 @@ class TestEnhancedCategorization:
             mock_config.LM_STUDIO_BASE_URL = 'http://localhost:1234/v1'
             mock_config.LM_STUDIO_MODEL = None
             mock_config.NUM_SUGGESTIONS = 5
-            self.client = LMStudioClient()
+            self.client = LMStudioClient(session=_offline_session())
         
         self.sample_transaction = {
             'id': 12345,
@@ -564,9 +778,10 @@ class TestEnhancedCategorization:
         assert result[0]['category']['full_name'] == 'Food & Dining\\Coffee Shops\\Starbucks'
         
         # Check that the prompt included hierarchical information
-        call_args = mock_call_llm.call_args[0][0]
-        assert 'Food & Dining\\Coffee Shops\\Starbucks' in call_args
-        assert 'parent context' in call_args.lower() or 'hierarchy' in call_args.lower()
+        system_prompt = mock_call_llm.call_args[1]['system_prompt']
+        assert 'Food & Dining\\Coffee Shops\\Starbucks' in system_prompt
+        assert 'parent context' in system_prompt.lower() or 'hierarchy' in system_prompt.lower()
+        assert 'STARBUCKS STORE #12345' in mock_call_llm.call_args[0][0]
     
     @patch.object(LMStudioClient, '_call_llm')
     def test_category_context_in_ai_suggestions(self, mock_call_llm):
@@ -641,4 +856,5 @@ class TestEnhancedCategorization:
         lines = formatted.split('\n')
         starbucks_line = next(line for line in lines if 'Starbucks' in line)
         assert 'Food & Dining\\Coffee Shops\\Starbucks' in starbucks_line
-        assert 'starbucks-uuid' in starbucks_line
\ No newline at end of file
+        assert starbucks_line.startswith('- [1] ')
+        assert 'starbucks-uuid' not in starbucks_line
\ No newline at end of file
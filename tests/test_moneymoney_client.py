@@ -1,14 +1,17 @@
 import pytest
+import io
 import plistlib
+import subprocess
 from unittest.mock import Mock, patch, MagicMock
 from moneymoney_client import MoneyMoneyClient
 
 
 class TestMoneyMoneyClient:
     
-    def setup_method(self):
-        self.client = MoneyMoneyClient()
-        self.sample_categories_plist = [
+    @classmethod
+    def setup_class(cls):
+        # Category samples are only read, so they and their serialized form are built once
+        cls.sample_categories_plist = [
             {
                 'name': 'Food & Dining',
                 'uuid': 'food-uuid',
@@ -34,7 +37,10 @@ class TestMoneyMoneyClient:
                 'indentation': 0
             }
         ]
-        
+        cls.sample_categories_bytes = plistlib.dumps(cls.sample_categories_plist)
+    
+    def setup_method(self):
+        self.client = MoneyMoneyClient()
         self.sample_transactions = [
             {
                 'id': 12345,
@@ -85,6 +91,64 @@ class TestMoneyMoneyClient:
         with pytest.raises(Exception, match="AppleScript execution failed"):
             self.client._run_applescript('test script')
     
+    @staticmethod
+    def _fake_popen(stdout, stderr=b'', returncode=0):
+        """Popen stand-in whose child writes stderr to the file it is given."""
+        process = Mock()
+        process.stdout = io.BytesIO(stdout)
+        process.wait.return_value = returncode
+        
+        def popen(argv, **kwargs):
+            kwargs['stderr'].write(stderr)
+            return process
+        return popen, process
+    
+    @patch('subprocess.Popen')
+    def test_run_applescript_plist_streams_stdout(self, mock_popen):
+        mock_popen.side_effect, mock_process = self._fake_popen(self.sample_categories_bytes)
+        
+        result = self.client._run_applescript_plist('test script')
+        
+        assert result == self.sample_categories_plist
+        args, kwargs = mock_popen.call_args
+        assert args == (['osascript', '-e', 'test script'],)
+        assert kwargs['stdout'] == subprocess.PIPE
+        assert kwargs['stderr'] not in (subprocess.PIPE, None)
+        mock_process.wait.assert_called_once()
+    
+    @patch('subprocess.Popen')
+    def test_run_applescript_plist_error(self, mock_popen):
+        mock_popen.side_effect, _ = self._fake_popen(b'', stderr=b'Script error', returncode=1)
+        
+        with pytest.raises(Exception, match="AppleScript execution failed: Script error"):
+            self.client._run_applescript_plist('test script')
+    
+    @pytest.mark.parametrize('output', [
+        pytest.param(b'invalid plist data', id='not_a_plist'),
+        pytest.param(plistlib.dumps({'a': 1}).replace(b'<integer>1</integer>', b'<integer>abc</integer>'),
+                     id='malformed_value'),
+    ])
+    @patch('subprocess.Popen')
+    def test_run_applescript_plist_invalid_output(self, mock_popen, output):
+        mock_popen.side_effect, mock_process = self._fake_popen(output)
+        
+        with pytest.raises(ValueError, match="Invalid plist output"):
+            self.client._run_applescript_plist('test script')
+        
+        mock_process.wait.assert_called_once()
+        assert mock_process.stdout.closed
+    
+    @patch('subprocess.Popen')
+    def test_run_applescript_plist_kills_child_on_unexpected_error(self, mock_popen):
+        mock_popen.side_effect, mock_process = self._fake_popen(self.sample_categories_bytes)
+        
+        with patch('plistlib.load', side_effect=KeyboardInterrupt):
+            with pytest.raises(KeyboardInterrupt):
+                self.client._run_applescript_plist('test script')
+        
+        mock_process.kill.assert_called_once()
+        mock_process.wait.assert_called_once()
+    
     def test_flatten_categories_simple(self):
         categories = [{'name': 'Test', 'uuid': 'test-uuid'}]
         result = self.client._flatten_categories(categories)
@@ -95,8 +159,23 @@ class TestMoneyMoneyClient:
         assert result[0]['path'] == 'Test'
         assert result[0]['full_name'] == 'Test'
     
+    def test_flatten_categories_nested(self):
+        categories = [
+            {'name': 'Food', 'uuid': 'food-uuid', 'categories': [
+                {'name': 'Coffee', 'uuid': 'coffee-uuid'},
+                {'name': 'Out', 'uuid': 'out-uuid', 'categories': [{'name': 'Pizza', 'uuid': 'pizza-uuid'}]},
+            ]},
+            {'name': 'Folder', 'uuid': 'folder-uuid', 'group': True},
+            {'name': 'Travel', 'uuid': 'travel-uuid'},
+        ]
+        result = self.client._flatten_categories(categories)
+        
+        assert [c['path'] for c in result] == ['Food > Coffee', 'Food > Out > Pizza', 'Travel']
+        assert [c['uuid'] for c in result] == ['coffee-uuid', 'pizza-uuid', 'travel-uuid']
+    
     def test_process_indentation_hierarchy(self):
         result = self.client._process_indentation_hierarchy(self.sample_categories_plist)
+        by_name = {c['name']: c for c in result}
         
         # Only leaf nodes should be included (Coffee, Restaurants, Transportation)
         # Food & Dining should be excluded as it's a group category
@@ -106,50 +185,48 @@ class TestMoneyMoneyClient:
         food_names = [c['name'] for c in result]
         assert 'Food & Dining' not in food_names
         
-        coffee_category = next(c for c in result if c['name'] == 'Coffee')
+        coffee_category = by_name['Coffee']
         assert coffee_category['full_name'] == 'Food & Dining > Coffee'
         assert coffee_category['moneymoney_path'] == 'Food & Dining\\Coffee'
         assert coffee_category['uuid'] == 'coffee-uuid'
         
-        restaurant_category = next(c for c in result if c['name'] == 'Restaurants')
+        restaurant_category = by_name['Restaurants']
         assert restaurant_category['full_name'] == 'Food & Dining > Restaurants'
         
-        transport_category = next(c for c in result if c['name'] == 'Transportation')
+        transport_category = by_name['Transportation']
         assert transport_category['full_name'] == 'Transportation'
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
-    def test_get_categories_success(self, mock_run):
-        plist_data = plistlib.dumps(self.sample_categories_plist).decode('utf-8')
-        mock_run.return_value = plist_data
+    def test_get_categories_success(self, fake_applescript):
+        fake_applescript['tell application "MoneyMoney" to export categories'] = self.sample_categories_plist
         
         result = self.client.get_categories()
         
+        by_name = {c['name']: c for c in result}
+        
         # Only leaf nodes should be returned (3: Coffee, Restaurants, Transportation)
         assert len(result) == 3
-        mock_run.assert_called_once_with('tell application "MoneyMoney" to export categories')
         
         # Verify the hierarchical structure
-        coffee_cat = next(cat for cat in result if cat['name'] == 'Coffee')
+        coffee_cat = by_name['Coffee']
         assert coffee_cat['full_name'] == 'Food & Dining > Coffee'
         assert coffee_cat['moneymoney_path'] == 'Food & Dining\\Coffee'
         
-        restaurants_cat = next(cat for cat in result if cat['name'] == 'Restaurants')
+        restaurants_cat = by_name['Restaurants']
         assert restaurants_cat['full_name'] == 'Food & Dining > Restaurants'
         
-        transport_cat = next(cat for cat in result if cat['name'] == 'Transportation')
+        transport_cat = by_name['Transportation']
         assert transport_cat['full_name'] == 'Transportation'  # Top-level category
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_get_categories_parse_error(self, mock_run):
-        mock_run.return_value = "invalid plist data"
+        mock_run.side_effect = ValueError("Invalid plist output")
         
         result = self.client.get_categories()
         assert result == []
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_get_uncategorized_transactions_success(self, mock_run):
-        plist_data = plistlib.dumps(self.sample_transactions).decode('utf-8')
-        mock_run.return_value = plist_data
+        mock_run.return_value = self.sample_transactions
         
         result = self.client.get_uncategorized_transactions('2024-01-01')
         
@@ -162,10 +239,9 @@ export transactions from category "" from date "2024-01-01" as "plist"
 end tell'''
         mock_run.assert_called_once_with(expected_script)
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_get_uncategorized_transactions_with_to_date(self, mock_run):
-        plist_data = plistlib.dumps(self.sample_transactions).decode('utf-8')
-        mock_run.return_value = plist_data
+        mock_run.return_value = self.sample_transactions
         
         result = self.client.get_uncategorized_transactions('2024-01-01', '2024-01-31')
         
@@ -174,43 +250,37 @@ export transactions from category "" from date "2024-01-01" to date "2024-01-31"
 end tell'''
         mock_run.assert_called_once_with(expected_script)
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_get_uncategorized_transactions_empty(self, mock_run):
-        mock_run.return_value = plistlib.dumps([]).decode('utf-8')
+        mock_run.return_value = []
         
         result = self.client.get_uncategorized_transactions('2024-01-01')
         assert result == []
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_get_uncategorized_transactions_parse_error(self, mock_run):
-        mock_run.return_value = "invalid plist"
+        mock_run.side_effect = ValueError("Invalid plist output")
         
         result = self.client.get_uncategorized_transactions('2024-01-01')
         assert result == []
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
-    def test_set_transaction_category_success(self, mock_run):
-        mock_run.return_value = ""
+    def test_set_transaction_category_success(self, fake_applescript):
+        fake_applescript['''tell application "MoneyMoney"
+    set transaction id 12345 category to "Food & Dining\\\\Coffee"
+end tell'''] = ""
         
         result = self.client.set_transaction_category(12345, "Food & Dining\\Coffee")
         
         assert result is True
-        expected_script = '''tell application "MoneyMoney"
-    set transaction id 12345 category to "Food & Dining\\\\Coffee"
-end tell'''
-        mock_run.assert_called_once_with(expected_script)
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
-    def test_set_transaction_category_with_quotes(self, mock_run):
-        mock_run.return_value = ""
+    def test_set_transaction_category_with_quotes(self, fake_applescript):
+        fake_applescript['''tell application "MoneyMoney"
+    set transaction id 12345 category to "Category with \\"quotes\\" and backslash\\\\"
+end tell'''] = ""
         
         result = self.client.set_transaction_category(12345, 'Category with "quotes" and backslash\\')
         
         assert result is True
-        expected_script = '''tell application "MoneyMoney"
-    set transaction id 12345 category to "Category with \\"quotes\\" and backslash\\\\"
-end tell'''
-        mock_run.assert_called_once_with(expected_script)
     
     @patch.object(MoneyMoneyClient, '_run_applescript')
     def test_set_transaction_category_error(self, mock_run):
@@ -219,6 +289,31 @@ end tell'''
         result = self.client.set_transaction_category(12345, "Food & Dining\\Coffee")
         assert result is False
     
+    @patch('subprocess.run')
+    def test_set_transaction_categories_batch(self, mock_run):
+        mock_run.return_value = Mock(stdout="ok\nfailed\nok\n")
+        assignments = [(1, "Food & Dining\\Coffee"), (2, 'Bad "Category"'), (3, "Transportation")]
+        
+        result = self.client.set_transaction_categories(assignments)
+        
+        assert result == [True, False, True]
+        mock_run.assert_called_once()
+        script = mock_run.call_args[0][0][2]
+        assert script.count('set transaction id') == 3
+        assert 'set transaction id 1 category to "Food & Dining\\\\Coffee"' in script
+        assert 'set transaction id 2 category to "Bad \\"Category\\""' in script
+    
+    @patch.object(MoneyMoneyClient, '_run_applescript')
+    def test_set_transaction_categories_batch_error(self, mock_run):
+        mock_run.side_effect = Exception("AppleScript error")
+        
+        assert self.client.set_transaction_categories([(1, "A"), (2, "B")]) == [False, False]
+    
+    @patch.object(MoneyMoneyClient, '_run_applescript')
+    def test_set_transaction_categories_batch_empty(self, mock_run):
+        assert self.client.set_transaction_categories([]) == []
+        mock_run.assert_not_called()
+    
     def test_format_transaction_complete(self):
         transaction = {
             'name': 'STARBUCKS',
@@ -240,6 +335,19 @@ end tell'''
         assert 'Coffee purchase' in result
         assert 'Test Account' in result
     
+    def test_format_transaction_with_preresolved_accounts(self):
+        transaction = {
+            'name': 'STARBUCKS',
+            'amount': -4.50,
+            'accountUuid': 'test-account-uuid'
+        }
+        
+        with patch.object(self.client, 'get_accounts') as mock_get_accounts:
+            result = self.client.format_transaction(transaction, {'test-account-uuid': 'Given Account'})
+        
+        assert 'Given Account' in result
+        mock_get_accounts.assert_not_called()
+    
     def test_format_transaction_minimal(self):
         transaction = {}
         
@@ -315,14 +423,14 @@ class TestPendingTransactionFiltering:
         ]
     
     @patch('moneymoney_client.Config')
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_exclude_pending_transactions_default(self, mock_applescript, mock_config):
         """Test that pending transactions are excluded by default."""
         mock_config.EXCLUDE_PENDING_TRANSACTIONS = True
         
         # Mock the AppleScript response with mixed transactions
         mock_response_data = {'transactions': self.mixed_transactions}
-        mock_applescript.return_value = plistlib.dumps(mock_response_data).decode('utf-8')
+        mock_applescript.return_value = mock_response_data
         
         result = self.client.get_uncategorized_transactions('2024-01-01', '2024-01-31')
         
@@ -335,7 +443,7 @@ class TestPendingTransactionFiltering:
         assert 12347 not in result_ids  # Unbooked transaction (bookingDate=None)
     
     @patch('moneymoney_client.Config')
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_pending_transaction_identification(self, mock_applescript, mock_config):
         """Test correct identification of pending vs booked transactions."""
         mock_config.EXCLUDE_PENDING_TRANSACTIONS = True
@@ -349,7 +457,7 @@ class TestPendingTransactionFiltering:
         ]
         
         mock_response_data = {'transactions': pending_scenarios}
-        mock_applescript.return_value = plistlib.dumps(mock_response_data).decode('utf-8')
+        mock_applescript.return_value = mock_response_data
         
         result = self.client.get_uncategorized_transactions('2024-01-01')
         
@@ -357,7 +465,7 @@ class TestPendingTransactionFiltering:
         assert len(result) == 0
     
     @patch('moneymoney_client.Config')
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_booked_vs_pending_transaction_filtering(self, mock_applescript, mock_config):
         """Test filtering between booked and pending transactions."""
         mock_config.EXCLUDE_PENDING_TRANSACTIONS = True
@@ -370,7 +478,7 @@ class TestPendingTransactionFiltering:
         ]
         
         mock_response_data = {'transactions': booked_scenarios}
-        mock_applescript.return_value = plistlib.dumps(mock_response_data).decode('utf-8')
+        mock_applescript.return_value = mock_response_data
         
         result = self.client.get_uncategorized_transactions('2024-01-01')
         
@@ -380,14 +488,14 @@ class TestPendingTransactionFiltering:
         assert all(id in result_ids for id in [1, 2, 3])
     
     @patch('moneymoney_client.Config')
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     @patch('moneymoney_client.logger')
     def test_logging_of_excluded_pending_count(self, mock_logger, mock_applescript, mock_config):
         """Test that excluded pending transaction count is logged."""
         mock_config.EXCLUDE_PENDING_TRANSACTIONS = True
         
         mock_response_data = {'transactions': self.mixed_transactions}
-        mock_applescript.return_value = plistlib.dumps(mock_response_data).decode('utf-8')
+        mock_applescript.return_value = mock_response_data
         
         self.client.get_uncategorized_transactions('2024-01-01', '2024-01-31')
         
@@ -398,7 +506,7 @@ class TestPendingTransactionFiltering:
         assert pending_log_found, f"Expected pending transaction log message. Actual calls: {log_calls}"
     
     @patch('moneymoney_client.Config')
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_empty_result_when_all_pending(self, mock_applescript, mock_config):
         """Test empty result when all transactions are pending."""
         mock_config.EXCLUDE_PENDING_TRANSACTIONS = True
@@ -411,20 +519,20 @@ class TestPendingTransactionFiltering:
         ]
         
         mock_response_data = {'transactions': all_pending}
-        mock_applescript.return_value = plistlib.dumps(mock_response_data).decode('utf-8')
+        mock_applescript.return_value = mock_response_data
         
         result = self.client.get_uncategorized_transactions('2024-01-01')
         
         assert len(result) == 0
     
     @patch('moneymoney_client.Config')
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_exclude_pending_disabled(self, mock_applescript, mock_config):
         """Test that all transactions are included when exclude pending is disabled."""
         mock_config.EXCLUDE_PENDING_TRANSACTIONS = False
         
         mock_response_data = {'transactions': self.mixed_transactions}
-        mock_applescript.return_value = plistlib.dumps(mock_response_data).decode('utf-8')
+        mock_applescript.return_value = mock_response_data
         
         result = self.client.get_uncategorized_transactions('2024-01-01', '2024-01-31')
         
@@ -434,7 +542,7 @@ class TestPendingTransactionFiltering:
         assert all(tid in result_ids for tid in [12345, 12346, 12347, 12348])
     
     @patch('moneymoney_client.Config')
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_categorized_transactions_still_filtered(self, mock_applescript, mock_config):
         """Test that categorized transactions are still filtered by uncategorized logic."""
         mock_config.EXCLUDE_PENDING_TRANSACTIONS = True
@@ -448,7 +556,7 @@ class TestPendingTransactionFiltering:
         ]
         
         mock_response_data = {'transactions': mixed_categorized}
-        mock_applescript.return_value = plistlib.dumps(mock_response_data).decode('utf-8')
+        mock_applescript.return_value = mock_response_data
         
         result = self.client.get_uncategorized_transactions('2024-01-01')
         
@@ -499,24 +607,25 @@ class TestHierarchicalCategoryStructure:
     def test_category_flattening_with_parent_context(self):
         """Test that flattened categories include parent context information."""
         result = self.client._flatten_categories_with_context(self.hierarchical_categories)
+        by_name = {c['name']: c for c in result}
         
         # Should have 6 leaf categories: Starbucks, Local Coffee, Restaurants, Fast Food, Gas, Public Transit, Bills
         assert len(result) == 7
         
         # Check Starbucks has full parent context
-        starbucks = next(c for c in result if c['name'] == 'Starbucks')
+        starbucks = by_name['Starbucks']
         assert starbucks['full_name'] == 'Food & Dining > Coffee Shops > Starbucks'
         assert starbucks['parent_path'] == 'Food & Dining > Coffee Shops'
         assert starbucks['hierarchy_level'] == 3
         
         # Check Bills (top-level with no subcategories)
-        bills = next(c for c in result if c['name'] == 'Bills')
+        bills = by_name['Bills']
         assert bills['full_name'] == 'Bills'
         assert bills['parent_path'] == ''
         assert bills['hierarchy_level'] == 1
         
         # Check Gas (second level)
-        gas = next(c for c in result if c['name'] == 'Gas')
+        gas = by_name['Gas']
         assert gas['full_name'] == 'Transportation > Gas'
         assert gas['parent_path'] == 'Transportation'
         assert gas['hierarchy_level'] == 2
@@ -557,23 +666,24 @@ class TestHierarchicalCategoryStructure:
     def test_category_depth_calculation(self):
         """Test that hierarchy levels are correctly calculated."""
         result = self.client._flatten_categories_with_context(self.hierarchical_categories)
+        by_name = {c['name']: c for c in result}
         
         # Bills should be level 1 (top-level, no children)
-        bills = next(c for c in result if c['name'] == 'Bills')
+        bills = by_name['Bills']
         assert bills['hierarchy_level'] == 1
         
         # Gas should be level 2 (Transportation > Gas)
-        gas = next(c for c in result if c['name'] == 'Gas')
+        gas = by_name['Gas']
         assert gas['hierarchy_level'] == 2
         
         # Starbucks should be level 3 (Food & Dining > Coffee Shops > Starbucks)
-        starbucks = next(c for c in result if c['name'] == 'Starbucks')
+        starbucks = by_name['Starbucks']
         assert starbucks['hierarchy_level'] == 3
     
-    @patch.object(MoneyMoneyClient, '_run_applescript')
+    @patch.object(MoneyMoneyClient, '_run_applescript_plist')
     def test_get_categories_uses_indentation_processing(self, mock_applescript):
         """Test that get_categories uses the indentation hierarchy processing method."""
-        mock_applescript.return_value = plistlib.dumps(self.hierarchical_categories).decode('utf-8')
+        mock_applescript.return_value = self.hierarchical_categories
         
         with patch.object(self.client, '_process_indentation_hierarchy') as mock_process:
             mock_process.return_value = [